@@ -1,28 +1,53 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from background_remover import BackgroundRemover
-from PIL import Image
-import io
+from fastapi.responses import JSONResponse, Response
+from engine import Engine, create_engine, ENGINE_BACKEND, ENGINE_BACKENDS
+from result_cache import ResultCache
+from worker_pool import WorkerPool, QueueFullError, WORKER_THREADS
+from batch_scheduler import BatchScheduler, BATCH_MAX_SIZE
+from model_registry import ModelRegistry, AVAILABLE_MODELS, QUANTIZED_MODELS, DEFAULT_MODEL, MODELS_DIR
+from image_io import encode_image, validate_encode_options, OUTPUT_FORMATS, DEFAULT_PNG_COMPRESS_LEVEL
+from metrics import (
+    REGISTRY, REQUEST_SECONDS, REQUESTS, ERRORS, REJECTIONS, CACHE_LOOKUPS,
+    IN_FLIGHT, QUEUE_DEPTH, WORKERS_BUSY, stage
+)
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
 
 # 创建FastAPI应用
 app = FastAPI()
 
-# 添加CORS中间件
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # 支持的图片格式
 SUPPORTED_FORMATS = {"image/jpeg", "image/png", "image/jpg"}
 # 最大文件大小（4MB）
 MAX_FILE_SIZE = 4 * 1024 * 1024
+# 可直接返回二进制图片的 Accept 类型及对应的输出格式
+BINARY_MEDIA_TYPES = {
+    "image/png": "png",
+    "image/webp": "webp",
+    "application/octet-stream": "png",
+}
+
+# multipart 表单中除文件内容外其他部分（边界、字段）的余量
+MULTIPART_OVERHEAD = 64 * 1024
+
+class UploadSizeLimitMiddleware:
+    """Content-Length 已超过上限的请求在解析表单前直接拒绝，不再读取整个请求体"""
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST":
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if length.isdigit() and int(length) > self.max_body_size:
+                REJECTIONS.inc(reason="too_large")
+                await too_large_response()(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
 
 class APIResponse:
     def __init__(
@@ -42,66 +67,333 @@ class APIResponse:
             "data": self.data
         }
 
-async def validate_image(file: UploadFile) -> None:
-    # 检查文件大小
-    contents = await file.read()
-    if len(contents) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"文件大小超过限制，最大允许{MAX_FILE_SIZE/1024/1024}MB"
+# 文件头魔数对应的图片类型
+MAGIC_BYTES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+}
+# 分块读取上传文件的块大小
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """根据文件头识别图片类型，不信任客户端提供的 content_type"""
+    for magic, media_type in MAGIC_BYTES.items():
+        if header.startswith(magic):
+            return media_type
+    return None
+
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"文件大小超过限制，最大允许{MAX_FILE_SIZE/1024/1024}MB"
+    )
+
+def too_large_response() -> JSONResponse:
+    """上传过大的响应：中间件和分块读取两处都返回真实的413状态码，响应体 code 也为413"""
+    return JSONResponse(
+        status_code=413,
+        content=APIResponse(code=413, message=str(file_too_large().detail), data=None).dict()
+    )
+
+async def validate_image(file: UploadFile) -> bytes:
+    """分块读取并验证上传的图片，返回文件内容
+
+    超过 MAX_FILE_SIZE 时立即停止读取；图片类型由文件头判断。
+    """
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        # 检查文件类型（第一块即可判断），错误信息给出识别出的类型而不是客户端声明的类型
+        if not chunks:
+            detected = sniff_image_type(chunk)
+            if detected not in SUPPORTED_FORMATS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"不支持的文件类型：{detected or '未知'}"
+                )
+
+        # 检查文件大小
+        size += len(chunk)
+        if size > MAX_FILE_SIZE:
+            raise file_too_large()
+        chunks.append(chunk)
+
+    if not chunks:
+        raise HTTPException(status_code=400, detail="上传的文件为空")
+
+    # 只拼接一次；bytes 传给 BytesIO 时不会再复制
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+app.add_middleware(UploadSizeLimitMiddleware, max_body_size=MAX_FILE_SIZE + MULTIPART_OVERHEAD)
+
+# 添加CORS中间件（最后添加的中间件在最外层，大小限制的提前拒绝也带上CORS响应头）
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+def negotiate_binary(accept: Optional[str]) -> Optional[str]:
+    """根据 Accept 请求头选择二进制响应的媒体类型，返回 None 表示使用JSON响应
+
+    按q值从高到低（同q值按出现顺序）取第一个支持的类型；application/json 或 */* 优先时使用JSON。
+    """
+    if not accept:
+        return None
+    candidates = []
+    for index, part in enumerate(accept.split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            candidates.append((-q, index, media_type.lower()))
+    for _, _, media_type in sorted(candidates):
+        if media_type in BINARY_MEDIA_TYPES:
+            return media_type
+        if media_type in ("application/json", "*/*", "application/*"):
+            return None
+    return None
+
+# 推理后端（默认直接运行ONNX模型）
+BACKEND = ENGINE_BACKEND or "onnx"
+if BACKEND not in ENGINE_BACKENDS:
+    raise ValueError(f"不支持的后端: {BACKEND}，可选后端: {', '.join(ENGINE_BACKENDS)}")
+
+# 默认模型的加载时机：eager 导入模块时加载（默认）；background 导入后在后台线程加载；
+# lazy 第一个用到模型的请求到来时加载。Serverless 部署用 background 或 lazy，
+# 模块导入（冷启动）不再包含推理依赖的导入和会话创建
+WARMUP_MODES = ["eager", "background", "lazy"]
+WARMUP_MODE = os.getenv("WARMUP_MODE", "eager")
+if WARMUP_MODE not in WARMUP_MODES:
+    raise ValueError(f"不支持的 WARMUP_MODE: {WARMUP_MODE}，可选: {', '.join(WARMUP_MODES)}")
+
+def load_model(name: str) -> Engine:
+    """加载模型；onnx 后端开启合批（BATCH_MAX_SIZE > 1）时并发请求的推理会合并执行"""
+    with stage("model_load"):
+        return create_engine(
+            BACKEND, name, models_dir=str(model_registry.models_dir), max_batch_size=BATCH_MAX_SIZE
         )
-    
-    # 检查文件类型
-    if file.content_type not in SUPPORTED_FORMATS:
+
+def generated_quantized_models() -> List[str]:
+    """模型目录中已由 quantize_model.py 生成的量化模型（量化模型只有 onnx 后端支持）"""
+    if BACKEND != "onnx":
+        return []
+    return [name for name in QUANTIZED_MODELS if os.path.exists(os.path.join(MODELS_DIR, f"{name}.onnx"))]
+
+# 模型注册表：按需加载模型，在内存预算内按LRU淘汰
+# 未生成的量化模型不列出，请求时和未知模型一样返回“不支持的模型”
+model_registry = ModelRegistry(load_model, available=AVAILABLE_MODELS + generated_quantized_models())
+
+# 预热状态（/api/status 中返回，seconds 为预热加载默认模型的耗时）
+warmup_state: Dict[str, Any] = {"mode": WARMUP_MODE, "seconds": None, "error": None}
+
+def warmup() -> None:
+    """预加载默认模型并记录耗时
+
+    后台预热失败时只记录错误，第一个请求会重新加载并把错误返回给客户端。
+    请求在预热完成前到来时，注册表保证同一模型只加载一次，请求等待加载完成。
+    """
+    start = time.perf_counter()
+    try:
+        model_registry.preload([DEFAULT_MODEL])
+    except Exception as e:
+        warmup_state["error"] = str(e)
+        if WARMUP_MODE == "eager":
+            raise
+    finally:
+        warmup_state["seconds"] = time.perf_counter() - start
+
+if WARMUP_MODE == "eager":
+    warmup()
+elif WARMUP_MODE == "background":
+    threading.Thread(target=warmup, name="model-warmup", daemon=True).start()
+
+# 结果缓存：相同图片、模型和选项直接返回之前的结果
+result_cache = ResultCache()
+
+# 解码、推理和编码在有界线程池中运行，避免阻塞事件循环
+# 开启合批时工作线程会等待凑批，线程数至少要等于batch大小才能凑满一批
+worker_pool = WorkerPool(max_workers=max(WORKER_THREADS, BATCH_MAX_SIZE))
+QUEUE_DEPTH.set_function(lambda: worker_pool.pending - worker_pool.running)
+WORKERS_BUSY.set_function(lambda: worker_pool.running)
+
+def process_image(
+    model: Optional[str],
+    contents: bytes,
+    refine: bool,
+    output_format: str = "png",
+    encode_options: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """取得模型、解码、去除背景并编码（在工作线程中运行）；mask 格式跳过全分辨率合成
+
+    模型未加载（首次使用、被淘汰或正在被其他请求加载）时在这里等待加载，不阻塞事件循环。
+    """
+    background_remover = get_background_remover(model)
+    output_image = background_remover.remove_background_file(
+        contents, refine=refine, mask_only=output_format == "mask"
+    )
+    with stage("encode"):
+        return encode_image(output_image, output_format, **(encode_options or {}))
+
+def process_image_cached(
+    model: Optional[str],
+    contents: bytes,
+    refine: bool,
+    output_format: str,
+    encode_options: Dict[str, Any]
+) -> Tuple[bytes, bool]:
+    """先查结果缓存，未命中时处理并写入缓存（在工作线程中运行），返回（结果字节, 是否命中）
+
+    计算哈希和磁盘缓存的读写、淘汰都是阻塞操作，因此和推理一样不在事件循环中执行。
+    """
+    # 相同内容和选项命中缓存时跳过推理和编码
+    cache_key = ResultCache.key(
+        contents, backend=BACKEND, model=model or DEFAULT_MODEL, refine=refine, format=output_format,
+        **encode_options
+    )
+    img_byte_arr = result_cache.get(cache_key)
+    if img_byte_arr is not None:
+        return img_byte_arr, True
+
+    img_byte_arr = process_image(model, contents, refine, output_format, encode_options)
+    result_cache.put(cache_key, img_byte_arr)
+    return img_byte_arr, False
+
+def validate_output_options(output_format: str, compress_level: int, quality: int) -> None:
+    try:
+        validate_encode_options(output_format, compress_level, quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def get_background_remover(model: Optional[str]) -> Engine:
+    try:
+        return model_registry.get(model)
+    except KeyError:
         raise HTTPException(
             status_code=400,
-            detail=f"不支持的文件类型：{file.content_type}"
+            detail=f"不支持的模型：{model}，可选模型：{', '.join(model_registry.available)}"
         )
-    
-    await file.seek(0)
 
-# 初始化背景移除器
-background_remover = BackgroundRemover()
+def error_response(code: int, message: str, binary: bool):
+    """错误响应；二进制模式下使用真实的HTTP状态码，避免客户端把JSON当作图片"""
+    content = APIResponse(code=code, message=message, data=None).dict()
+    if binary:
+        return JSONResponse(status_code=code, content=content)
+    return content
 
 @app.post("/api/remove-background")
-async def remove_background(file: UploadFile = File(...)):
+async def remove_background(
+    file: UploadFile = File(...),
+    model: Optional[str] = Form(None),
+    refine: bool = Form(False),
+    output_format: Optional[str] = Form(None),
+    compress_level: int = Form(DEFAULT_PNG_COMPRESS_LEVEL),
+    lossless: bool = Form(True),
+    quality: int = Form(90),
+    accept: Optional[str] = Header(None)
+):
+    # Accept 为 image/png、image/webp 或 application/octet-stream 时直接返回图片字节，
+    # 元数据放在响应头中；否则保持原有的 Base64 JSON 响应
+    media_type = negotiate_binary(accept)
+    # 输出格式：表单字段优先，其次由 Accept 决定，默认PNG
+    output_format = (output_format or (BINARY_MEDIA_TYPES[media_type] if media_type else "png")).lower()
+    encode_options = {"compress_level": compress_level, "lossless": lossless, "quality": quality}
+    start = time.perf_counter()
+    IN_FLIGHT.inc()
     try:
-        # 验证图片
-        await validate_image(file)
-        
-        # 读取和处理图片
-        contents = await file.read()
-        input_image = Image.open(io.BytesIO(contents))
-        output_image = background_remover.remove_background(input_image)
+        response, outcome = await _remove_background(
+            file, model, refine, output_format, encode_options, media_type, start
+        )
+    finally:
+        IN_FLIGHT.dec()
+    REQUESTS.inc(outcome=outcome)
+    REQUEST_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+    return response
+
+async def _remove_background(
+    file: UploadFile,
+    model: Optional[str],
+    refine: bool,
+    output_format: str,
+    encode_options: Dict[str, Any],
+    media_type: Optional[str],
+    start: float
+):
+    """处理去背景请求，返回（响应, 结果分类）；结果分类用于 /metrics 统计"""
+    try:
+        validate_output_options(output_format, encode_options["compress_level"], encode_options["quality"])
+
+        # 读取并验证图片
+        with stage("upload"):
+            contents = await validate_image(file)
         
+        img_byte_arr, cache_hit = await worker_pool.run(
+            process_image_cached, model, contents, refine, output_format, encode_options
+        )
+        CACHE_LOOKUPS.inc(result="hit" if cache_hit else "miss")
+
+        outcome = "cache_hit" if cache_hit else "success"
+        if media_type:
+            return Response(
+                content=img_byte_arr,
+                media_type=media_type if media_type == "application/octet-stream" else OUTPUT_FORMATS[output_format],
+                headers={
+                    "X-Image-Format": output_format,
+                    "X-Model": model or DEFAULT_MODEL,
+                    "X-Refine": str(refine).lower(),
+                    "X-Cache": "HIT" if cache_hit else "MISS",
+                    "X-Processing-Time-Ms": f"{(time.perf_counter() - start) * 1000:.1f}",
+                }
+            ), outcome
+
         # 转换为Base64
-        img_byte_arr = io.BytesIO()
-        output_image.save(img_byte_arr, format='PNG', optimize=True)
-        img_byte_arr = img_byte_arr.getvalue()
         import base64
-        img_base64 = base64.b64encode(img_byte_arr).decode('utf-8')
+        with stage("base64"):
+            img_base64 = base64.b64encode(img_byte_arr).decode('utf-8')
         
         return APIResponse(
             code=0,
             message="背景去除成功",
             data={
                 "image": img_base64,
-                "format": "png"
+                "format": output_format
             }
-        ).dict()
+        ).dict(), outcome
         
+    except QueueFullError as e:
+        # 队列已满时快速拒绝，返回真实的503状态码便于负载均衡和客户端重试
+        REJECTIONS.inc(reason="queue_full")
+        return JSONResponse(
+            status_code=503,
+            content=APIResponse(code=503, message=str(e), data=None).dict(),
+            headers={"Retry-After": "1"}
+        ), "rejected"
     except HTTPException as e:
-        return APIResponse(
-            code=e.status_code,
-            message=str(e.detail),
-            data=None
-        ).dict()
+        if e.status_code == 413:
+            # 与 Content-Length 超限时相同，不区分JSON和二进制模式
+            REJECTIONS.inc(reason="too_large")
+            return too_large_response(), "rejected"
+        ERRORS.inc(code=e.status_code)
+        return error_response(e.status_code, str(e.detail), binary=media_type is not None), "client_error"
     except Exception as e:
-        return APIResponse(
-            code=500,
-            message="处理图片时发生错误",
-            data=None
-        ).dict()
+        ERRORS.inc(code=500)
+        return error_response(500, "处理图片时发生错误", binary=media_type is not None), "error"
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus 文本格式的指标：各阶段耗时直方图、请求结果、缓存命中、队列深度等"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -115,7 +407,20 @@ async def get_status():
         data={
             "status": "running",
             "supported_formats": list(SUPPORTED_FORMATS),
-            "max_file_size_mb": MAX_FILE_SIZE/1024/1024
+            "output_formats": list(OUTPUT_FORMATS),
+            "max_file_size_mb": MAX_FILE_SIZE/1024/1024,
+            "backend": BACKEND,
+            "default_model": DEFAULT_MODEL,
+            "available_models": model_registry.available,
+            "warmup": {**warmup_state, "ready": DEFAULT_MODEL in model_registry.loaded()},
+            "model_cache": model_registry.stats(),
+            "result_cache": result_cache.stats(),
+            "worker_pool": worker_pool.stats(),
+            "batching": {
+                name: model.stats()
+                for name, model in model_registry.items()
+                if isinstance(model, BatchScheduler)
+            }
         }
     ).dict()
 
@@ -1,11 +1,6 @@
-from flask import Flask, request, send_file
-from rembg import remove
-from PIL import Image
-import io
-import tempfile
+from flask import Flask, Response, request
 import os
 import logging
-from rembg.session_factory import new_session
 import sys
 
 
@@ -19,8 +14,31 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 app = Flask(__name__)
 app.logger.setLevel(logging.INFO)  # 设置日志级别
 
-# 使用 u2netp 模型 (仅 4.7MB) 替代 u2net (176MB)
-session = new_session("u2netp")  # 应用启动时加载
+from model_registry import ModelRegistry, DEFAULT_MODEL
+from engine import create_engine, ENGINE_BACKEND
+from image_io import encode_image, validate_encode_options, OUTPUT_FORMATS, DEFAULT_PNG_COMPRESS_LEVEL
+
+# 推理后端（默认使用 rembg，ENGINE_BACKEND=onnx 时与 api_server.py 使用相同的ONNX引擎）
+BACKEND = ENGINE_BACKEND or "rembg"
+
+# 按需加载引擎，默认使用 u2netp 模型 (仅 4.7MB)，可按请求切换 u2net (176MB)
+sessions = ModelRegistry(
+    lambda name: create_engine(BACKEND, name, models_dir=os.environ["U2NET_HOME"]),
+    models_dir=os.environ["U2NET_HOME"]
+)
+sessions.preload([DEFAULT_MODEL])  # 应用启动时加载
+
+# 各输出格式的下载文件名
+DOWNLOAD_NAMES = {'png': 'no-bg.png', 'webp': 'no-bg.webp', 'mask': 'no-bg-mask.png'}
+
+def output_options():
+    """从表单读取输出编码选项（字段和默认值与 api_server.py 相同），不合法时抛出 ValueError"""
+    output_format = (request.form.get('output_format') or 'png').lower()
+    compress_level = int(request.form.get('compress_level', DEFAULT_PNG_COMPRESS_LEVEL))
+    quality = int(request.form.get('quality', 90))
+    lossless = request.form.get('lossless', 'true').lower() not in ('false', '0', 'no', 'off')
+    validate_encode_options(output_format, compress_level, quality)
+    return output_format, {'compress_level': compress_level, 'lossless': lossless, 'quality': quality}
 
 @app.route('/remove_bg', methods=['POST'])
 def remove_background_api():
@@ -36,34 +54,36 @@ def remove_background_api():
         if not image_file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
             return {'error': 'Invalid image format. Use PNG, JPG or JPEG'}, 400
 
-        app.logger.info(f"Processing image: {image_file.filename}")
+        # 选择模型（可选）
+        model = request.form.get('model') or DEFAULT_MODEL
+        if model not in sessions.available:
+            return {'error': f'Invalid model. Use one of: {", ".join(sessions.available)}'}, 400
 
-        # 3. 读取图片并处理
-        input_image = Image.open(image_file.stream)
-        output_image = remove(input_image, session=session)  # 调用你的去背景函数
+        # 输出格式和编码选项（可选）
+        try:
+            output_format, encode_options = output_options()
+        except ValueError as e:
+            return {'error': str(e)}, 400
 
-        # 4. 创建临时文件保存结果
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-            output_image.save(tmp.name, format='PNG')
-            tmp_path = tmp.name
+        app.logger.info(f"Processing image: {image_file.filename} (model: {model}, backend: {BACKEND})")
 
-        # 5. 返回处理后的图片
-        return send_file(
-            tmp_path,
-            mimetype='image/png',
-            as_attachment=True,
-            download_name='no-bg.png'
+        # 3. 读取图片并处理（推理使用缩小解码的图片，全分辨率只用于合成；mask 格式跳过合成）
+        output_image = sessions.get(model).remove_background_file(
+            image_file.stream, mask_only=output_format == 'mask'
+        )
+
+        # 4. 在内存中编码并直接返回，不经过临时文件
+        image_bytes = encode_image(output_image, output_format, **encode_options)
+        return Response(
+            image_bytes,
+            mimetype=OUTPUT_FORMATS[output_format],
+            headers={'Content-Disposition': f'attachment; filename={DOWNLOAD_NAMES[output_format]}'}
         )
 
     except Exception as e:
         app.logger.error(f"处理错误: {str(e)}")
         return {'error': f'Internal server error: {str(e)}'}, 500
 
-    finally:
-        # 6. 清理临时文件
-        if 'tmp_path' in locals() and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-
 
 #if __name__ == '__main__':
 #    # Vercel 会自动设置 PORT 环境变量
@@ -74,9 +94,8 @@ def remove_background_api():
 # 在文件底部添加
 if __name__ == '__main__':
     # 测试模型加载
-    from rembg.session_factory import new_session
     print("测试模型加载...")
-    test_session = new_session("u2netp")
+    sessions.get(DEFAULT_MODEL)
     print("模型加载成功!")
     
     # 运行Flask应用
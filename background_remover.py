@@ -1,13 +1,144 @@
 import numpy as np
 import onnxruntime
 from PIL import Image
+from engine import Engine
+from metrics import stage
+from image_io import encode_image
 import io
+import os
+import sys
+import threading
 from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
 
-class BackgroundRemover:
-    def __init__(self, model_path: str = "models/u2netp.onnx"):
-        # 初始化 ONNX 运行时会话
-        self.session = onnxruntime.InferenceSession(model_path)
+# 图优化级别
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+# 执行模式
+EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def optimized_model_path(model_path: str, graph_optimization_level: str) -> Path:
+    """优化后模型的缓存路径，与原模型放在同一目录
+
+    文件名包含ONNX运行时版本：升级后不会加载旧版本生成的、可能不兼容的优化图。
+    """
+    path = Path(model_path)
+    return path.with_name(
+        f"{path.stem}.{graph_optimization_level}.ort{onnxruntime.__version__}.opt{path.suffix}"
+    )
+
+
+def quantized_model_path(model_path: str) -> Path:
+    """INT8量化模型的路径（由 quantize_model.py 生成）"""
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}_int8{path.suffix}")
+
+
+def create_session(
+    model_path: str,
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+    graph_optimization_level: Optional[str] = None,
+    execution_mode: Optional[str] = None,
+    cache_optimized: Optional[bool] = None,
+) -> onnxruntime.InferenceSession:
+    """创建 ONNX 运行时会话
+
+    未指定的参数从环境变量读取：ORT_INTRA_OP_THREADS、ORT_INTER_OP_THREADS、
+    ORT_GRAPH_OPTIMIZATION_LEVEL（disable/basic/extended/all）、ORT_EXECUTION_MODE
+    （sequential/parallel）、ORT_CACHE_OPTIMIZED（1/0）。线程数为0或未设置时由ONNX运行时自行决定。
+
+    开启缓存时（默认关闭），首次加载会把优化后的图保存到模型旁边，之后直接加载缓存并跳过图优化；
+    缓存无法加载时改为加载原模型并重新生成。注意 all 级别的缓存可能包含与CPU相关的优化，
+    只应在生成它的机器上使用，模型目录在多台机器间共享时应使用 extended 或不开启缓存。
+    """
+    if intra_op_threads is None:
+        intra_op_threads = _env_int("ORT_INTRA_OP_THREADS")
+    if inter_op_threads is None:
+        inter_op_threads = _env_int("ORT_INTER_OP_THREADS")
+    if graph_optimization_level is None:
+        graph_optimization_level = os.getenv("ORT_GRAPH_OPTIMIZATION_LEVEL", "all")
+    if execution_mode is None:
+        execution_mode = os.getenv("ORT_EXECUTION_MODE", "sequential")
+    if cache_optimized is None:
+        cache_optimized = os.getenv("ORT_CACHE_OPTIMIZED", "0") == "1"
+
+    if graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"不支持的图优化级别: {graph_optimization_level}")
+    if execution_mode not in EXECUTION_MODES:
+        raise ValueError(f"不支持的执行模式: {execution_mode}")
+
+    options = onnxruntime.SessionOptions()
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    if inter_op_threads:
+        options.inter_op_num_threads = inter_op_threads
+    options.execution_mode = EXECUTION_MODES[execution_mode]
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+
+    if not cache_optimized or graph_optimization_level == "disable":
+        return onnxruntime.InferenceSession(model_path, options)
+
+    # 缓存存在且不旧于原模型时，直接加载已优化的图
+    cache_path = optimized_model_path(model_path, graph_optimization_level)
+    if cache_path.exists() and cache_path.stat().st_mtime >= Path(model_path).stat().st_mtime:
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS["disable"]
+        try:
+            return onnxruntime.InferenceSession(str(cache_path), options)
+        except Exception as e:
+            # 缓存损坏或与当前机器不兼容时回退到原模型，并在下面重新生成缓存
+            print(f"加载优化缓存 {cache_path} 失败，改为加载原模型: {e}", file=sys.stderr)
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+
+    # 首次加载：先写入临时文件再原子替换，避免多个worker同时启动时读到写了一半的缓存
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    options.optimized_model_filepath = str(tmp_path)
+    try:
+        session = onnxruntime.InferenceSession(model_path, options)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        # 模型目录只读（如serverless环境）等情况下不缓存
+        if tmp_path.exists():
+            tmp_path.unlink()
+        options.optimized_model_filepath = ""
+        session = onnxruntime.InferenceSession(model_path, options)
+    return session
+
+
+class BackgroundRemover(Engine):
+    """直接运行ONNX模型的去背景引擎（onnx 后端）"""
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        model_path: str = "models/u2netp.onnx",
+        fast_upsample: bool = False,
+        refine_edges: bool = False,
+        quantized: bool = False,
+        session: Optional[onnxruntime.InferenceSession] = None,
+        **session_options,
+    ):
+        # 使用INT8量化模型
+        if quantized:
+            model_path = str(quantized_model_path(model_path))
+
+        # 初始化 ONNX 运行时会话（session_options 见 create_session）
+        self.session = session if session is not None else create_session(model_path, **session_options)
         
         # 获取模型的输入名称
         self.input_name = self.session.get_inputs()[0].name
@@ -16,72 +147,107 @@ class BackgroundRemover:
         # 模型输入大小
         self.input_size = 320
 
+        # 模型是否支持动态batch（固定batch=1的模型需要逐张推理）
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        self.dynamic_batch = not isinstance(batch_dim, int) or batch_dim <= 0
+
+        # 每个工作线程复用一块预分配的float32输入缓冲区
+        self._local = threading.local()
+
+        # 缩小倍数超过该值时，先用reduce做整数倍缩小再双线性插值（比直接LANCZOS快得多）
+        self.reducing_gap = 2.0
+
+        # 缩小解码到长边不小于 reducing_gap 倍的模型输入，保留预处理缩放的质量
+        self.decode_min_size = int(self.input_size * self.reducing_gap)
+
+        # mask放大到原图尺寸时使用的插值方式（双线性更快，LANCZOS边缘更锐利）
+        self.upsample = Image.BILINEAR if fast_upsample else Image.LANCZOS
+
+        # 是否默认用引导滤波细化mask边缘（可按调用覆盖）
+        self.refine_edges = refine_edges
+
+    def _letterbox(self, size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """计算等比缩放后的尺寸和在输入画布中的偏移: (宽, 高, x偏移, y偏移)"""
+        scale = self.input_size / max(size)
+        width, height = (max(1, int(x * scale)) for x in size)
+        return width, height, (self.input_size - width) // 2, (self.input_size - height) // 2
+
+    def _input_buffer(self, batch_size: int) -> np.ndarray:
+        """获取当前线程的输入缓冲区（按需扩容，返回前batch_size个的视图）"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            buffer = np.empty((batch_size, 3, self.input_size, self.input_size), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer[:batch_size]
+
+    def _resize(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """缩放到模型输入尺寸；大图先整数倍reduce再双线性插值，小图保持LANCZOS"""
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        if max(image.size) >= self.input_size * self.reducing_gap:
+            image = image.resize(size, Image.BILINEAR, reducing_gap=self.reducing_gap)
+        else:
+            image = image.resize(size, Image.LANCZOS)
+        return image.convert('RGB')
+
+    def _preprocess_batch(self, images: List[Image.Image]) -> np.ndarray:
+        """预处理一批图像，直接写入复用的NCHW缓冲区
+
+        返回的数组在同一线程下一次预处理时会被覆盖，调用方应在此之前用完。
+        """
+        with stage("preprocess"):
+            batch = self._input_buffer(len(images))
+            for i, image in enumerate(images):
+                width, height, x, y = self._letterbox(image.size)
+                resized = np.asarray(self._resize(image, (width, height)))
+
+                # 黑色填充letterbox区域，图像区域一次完成HWC->CHW转置、归一化和float32转换
+                batch[i].fill(0)
+                np.divide(resized.transpose((2, 0, 1)), np.float32(255),
+                          out=batch[i, :, y:y + height, x:x + width])
+            return batch
+
     def _preprocess(self, image: Image.Image) -> np.ndarray:
         """预处理图像"""
-        # 调整图像大小
-        image = image.convert('RGB')
-        temp_size = max(image.size)
-        scale = self.input_size / temp_size
-        new_size = tuple([int(x * scale) for x in image.size])
-        image = image.resize(new_size, Image.LANCZOS)
-
-        # 创建新的图像并粘贴调整后的图像
-        new_image = Image.new("RGB", (self.input_size, self.input_size), (0, 0, 0))
-        new_image.paste(image, ((self.input_size - new_size[0]) // 2,
-                               (self.input_size - new_size[1]) // 2))
-
-        # 转换为numpy数组并归一化
-        image = np.array(new_image)
-        image = image.transpose((2, 0, 1))  # 转换为CHW格式
-        image = image / 255.0  # 归一化到[0,1]
-        image = image.astype(np.float32)
-        image = np.expand_dims(image, 0)  # 添加batch维度
-        
-        return image
+        return self._preprocess_batch([image])
 
     def _postprocess(self, pred: np.ndarray, original_size: tuple) -> Image.Image:
         """后处理预测结果"""
-        # 获取预测的mask
-        pred = pred.squeeze()
-        
-        # 调整mask大小以匹配输入图像的尺寸
-        mask = Image.fromarray((pred * 255).astype(np.uint8))
-        mask = mask.resize(original_size, Image.LANCZOS)
-        
-        return mask
+        with stage("postprocess"):
+            # 获取预测的mask，裁掉letterbox填充区域，只保留图像部分
+            width, height, x, y = self._letterbox(original_size)
+            pred = pred.reshape(pred.shape[-2:])[y:y + height, x:x + width]
 
-    def remove_background(self, input_image: Image.Image) -> Image.Image:
-        """移除图像背景"""
-        # 保存原始尺寸
-        original_size = input_image.size
-        
-        # 预处理
-        image = self._preprocess(input_image)
-        
-        # 运行推理
-        pred = self.session.run([self.output_name], {self.input_name: image})[0]
-        
-        # 后处理获取mask
-        mask = self._postprocess(pred, original_size)
-        
-        # 创建透明背景的输出图像
-        output_image = Image.new('RGBA', original_size, (0, 0, 0, 0))
-        
-        # 将原始图像转换为RGBA
-        input_image = input_image.convert('RGBA')
-        
-        # 应用mask
-        pixels = input_image.load()
-        mask_pixels = mask.load()
-        output_pixels = output_image.load()
-        
-        for y in range(original_size[1]):
-            for x in range(original_size[0]):
-                r, g, b, a = pixels[x, y]
-                mask_value = mask_pixels[x, y]
-                output_pixels[x, y] = (r, g, b, int(mask_value))
-        
-        return output_image
+            # 调整mask大小以匹配输入图像的尺寸
+            mask = Image.fromarray((pred * 255).astype(np.uint8))
+            mask = mask.resize(original_size, self.upsample)
+            
+            return mask
+
+    def _predict(self, batch: np.ndarray) -> np.ndarray:
+        """对NCHW张量运行推理，返回N个预测结果"""
+        with stage("inference"):
+            if self.dynamic_batch or batch.shape[0] == 1:
+                return self.session.run([self.output_name], {self.input_name: batch})[0]
+            # 固定batch的模型只能逐张运行
+            return np.concatenate([
+                self.session.run([self.output_name], {self.input_name: batch[i:i + 1]})[0]
+                for i in range(batch.shape[0])
+            ])
+
+    def predict_mask(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """单张图像推理，返回尺寸为 size 的mask"""
+        return self._postprocess(self._predict(self._preprocess(image)), size)
+
+    def predict_masks(
+        self, images: List[Image.Image], sizes: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> List[Image.Image]:
+        """批量推理：N张图像合并为一个NCHW张量，只调用一次ONNX推理"""
+        if not images:
+            return []
+        sizes = sizes or [image.size for image in images]
+        preds = self._predict(self._preprocess_batch(images))
+        return [self._postprocess(preds[i:i + 1], size) for i, size in enumerate(sizes)]
 
     @staticmethod
     def from_bytes(image_bytes: bytes) -> Image.Image:
@@ -89,8 +255,14 @@ class BackgroundRemover:
         return Image.open(io.BytesIO(image_bytes))
 
     @staticmethod
-    def to_bytes(image: Image.Image, format: str = 'PNG') -> bytes:
-        """将PIL图像转换为字节数据"""
+    def to_bytes(image: Image.Image, format: str = 'PNG', **options) -> bytes:
+        """将PIL图像转换为字节数据
+
+        format 为 png/webp/mask 时使用 image_io.encode_image 的编码选项
+        （compress_level、lossless、quality），其他格式直接交给 Pillow。
+        """
+        if format.lower() in ('png', 'webp', 'mask'):
+            return encode_image(image, format.lower(), **options)
         img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format=format)
+        image.save(img_byte_arr, format=format, **options)
         return img_byte_arr.getvalue()
\ No newline at end of file
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# 输出目录中的清单文件名（分片运行时为 manifest.shard-<序号>-of-<总数>.jsonl）
+MANIFEST_NAME = "manifest.jsonl"
+SHARD_MANIFEST_PATTERN = "manifest.shard-*-of-*.jsonl"
+
+# 计算内容哈希时的读取块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shard_of(rel_path: str, shard_count: int) -> int:
+    """按相对路径的稳定哈希分片：与机器、挂载点和Python进程无关（不使用内置 hash()）"""
+    digest = hashlib.sha1(rel_path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+def manifest_name(shard_index: Optional[int] = None, shard_count: Optional[int] = None) -> str:
+    """清单文件名；每个分片写自己的清单，多台机器共享输出目录时互不覆盖"""
+    if shard_count is None:
+        return MANIFEST_NAME
+    return f"manifest.shard-{shard_index}-of-{shard_count}.jsonl"
+
+
+def read_entries(path: Path) -> Dict[str, Dict[str, Any]]:
+    """读取清单，同一路径以最后一条记录为准"""
+    entries: Dict[str, Dict[str, Any]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 崩溃时可能留下写了一半的最后一行
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def write_entries(path: Path, entries: Iterable[Dict[str, Any]]) -> None:
+    """写出清单（写临时文件后原子替换）"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def merge_manifests(output_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """合并输出目录中的所有清单（主清单和各分片清单）；同一路径优先取成功的记录"""
+    entries: Dict[str, Dict[str, Any]] = {}
+    paths = sorted(output_dir.glob(SHARD_MANIFEST_PATTERN))
+    if (output_dir / MANIFEST_NAME).exists():
+        paths.insert(0, output_dir / MANIFEST_NAME)
+    for path in paths:
+        for rel_path, entry in read_entries(path).items():
+            current = entries.get(rel_path)
+            if current is None or entry["status"] == "done" or current["status"] != "done":
+                entries[rel_path] = entry
+    return entries
+
+
+def verify_coverage(
+    entries: Dict[str, Dict[str, Any]], expected: Dict[str, Path], output_dir: Path, options: Dict[str, Any]
+) -> Dict[str, List[str]]:
+    """检查 expected（相对路径 -> 输入路径）中的每个输入是否都已用 options 成功处理
+
+    返回各类问题的相对路径列表：missing 没有记录，failed 处理失败，
+    stale 输入在处理后被修改或选项不同，output_missing 记录为成功但输出文件不存在。
+    """
+    problems: Dict[str, List[str]] = {"missing": [], "failed": [], "stale": [], "output_missing": []}
+    for rel_path, input_path in expected.items():
+        entry = entries.get(rel_path)
+        if entry is None:
+            problems["missing"].append(rel_path)
+            continue
+        if entry["status"] != "done":
+            problems["failed"].append(rel_path)
+            continue
+        stat = input_path.stat()
+        if (entry.get("options") != options or entry.get("size") != stat.st_size
+                or entry.get("mtime_ns") != stat.st_mtime_ns):
+            problems["stale"].append(rel_path)
+        elif not (output_dir / entry.get("output", "")).is_file():
+            problems["output_missing"].append(rel_path)
+    return problems
+
+
+class BatchManifest:
+    """批量处理清单：记录每个输入文件的大小、修改时间（可选内容哈希）、处理选项和结果
+
+    每处理完一张图片追加一行JSON并立即刷新，进程崩溃时最多丢失正在处理的几张；
+    重新运行时跳过未变化且已成功的输入，重试失败的和新增的文件。
+    同一路径出现多条记录时以最后一条为准，打开时会压缩为每个路径一条。
+    只应在一个线程中调用 record()。
+    """
+
+    def __init__(self, path: Path, options: Dict[str, Any], use_hash: bool = False):
+        self.path = Path(path)
+        self.options = options
+        self.use_hash = use_hash
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._file = None
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        self.entries = read_entries(self.path)
+        # 每个路径只保留最后一条记录
+        write_entries(self.path, self.entries.values())
+
+    def fingerprint(self, input_path: Path) -> Dict[str, Any]:
+        """输入文件的指纹：大小、修改时间，开启 use_hash 时另含sha256"""
+        stat = input_path.stat()
+        fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if self.use_hash:
+            fingerprint["sha256"] = file_sha256(input_path)
+        return fingerprint
+
+    def needs_processing(self, rel_path: str, input_path: Path, output_path: Path) -> Optional[Dict[str, Any]]:
+        """判断输入是否需要（重新）处理，需要时返回其指纹（大小、修改时间，开启 use_hash 时含sha256），
+        可以跳过时返回 None"""
+        stat = input_path.stat()
+        fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        entry = self.entries.get(rel_path)
+        unchanged = (
+            entry is not None
+            and entry.get("status") == "done"
+            and entry.get("options") == self.options
+            and entry.get("size") == stat.st_size
+            and output_path.exists()
+        )
+        if unchanged and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return None
+
+        if self.use_hash:
+            fingerprint["sha256"] = file_sha256(input_path)
+            # 修改时间变了（如复制或touch）但内容相同时不必重新处理
+            if unchanged and fingerprint["sha256"] == entry.get("sha256"):
+                self.record(rel_path, fingerprint, "done", output=entry.get("output"))
+                return None
+        return fingerprint
+
+    def record(
+        self, rel_path: str, fingerprint: Dict[str, Any], status: str,
+        output: Optional[str] = None, error: Optional[str] = None
+    ) -> None:
+        """追加一条处理结果（status 为 done 或 failed）"""
+        entry = {"path": rel_path, **fingerprint, "options": self.options, "status": status}
+        if output is not None:
+            entry["output"] = output
+        if error is not None:
+            entry["error"] = error
+        self.entries[rel_path] = entry
+
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def summary(self) -> Dict[str, int]:
+        """按状态统计记录数"""
+        counts: Dict[str, int] = {}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "BatchManifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
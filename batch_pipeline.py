@@ -0,0 +1,111 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+# 各阶段之间队列的默认容量（决定同时驻留内存的图片数上限）
+DEFAULT_QUEUE_SIZE = 16
+
+# 阶段结束标记
+_DONE = object()
+
+
+def run_pipeline(
+    items: Iterable[Any],
+    decode: Callable[[Any], Any],
+    infer_batch: Callable[[List[Any]], List[Any]],
+    encode: Callable[[Any, Any, Any], None],
+    decode_workers: int = 2,
+    encode_workers: int = 2,
+    batch_size: int = 4,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+) -> Iterator[Tuple[Any, Optional[BaseException]]]:
+    """分阶段流水线：解码 -> 批量推理 -> 编码写出，阶段之间用有界队列连接
+
+    - decode(item) 在 decode_workers 个线程中运行（文件读取和解码），返回推理输入；
+    - infer_batch(decoded_list) 在单独的推理线程中运行，一次处理最多 batch_size 个已解码的输入，
+      返回同样顺序的推理结果；
+    - encode(item, decoded, result) 在 encode_workers 个线程中运行（合成、编码和写文件）。
+
+    解码、推理和编码互相重叠，CPU不会因为等待I/O或编码而空闲；所有队列都有容量上限，
+    处理数万张图片时驻留内存的图片数也是有界的。按完成顺序逐个产出（item, 异常或None）。
+    """
+    items_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    decoded_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    inferred_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    results_q: "queue.Queue" = queue.Queue()
+
+    def feed():
+        for item in items:
+            items_q.put(item)
+        for _ in range(decode_workers):
+            items_q.put(_DONE)
+
+    def decode_loop():
+        while True:
+            item = items_q.get()
+            if item is _DONE:
+                decoded_q.put(_DONE)
+                return
+            try:
+                decoded_q.put((item, decode(item), None))
+            except Exception as e:
+                results_q.put((item, e))
+
+    def infer_loop():
+        running = decode_workers
+        while running:
+            entry = decoded_q.get()
+            if entry is _DONE:
+                running -= 1
+                continue
+            # 不等待凑批：队列里已有的输入合并为一批，没有积压时单张推理
+            batch = [entry]
+            while len(batch) < batch_size:
+                try:
+                    entry = decoded_q.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _DONE:
+                    running -= 1
+                    continue
+                batch.append(entry)
+            try:
+                outputs = infer_batch([decoded for _, decoded, _ in batch])
+            except Exception as e:
+                for item, _, _ in batch:
+                    results_q.put((item, e))
+                continue
+            for (item, decoded, _), output in zip(batch, outputs):
+                inferred_q.put((item, decoded, output))
+        for _ in range(encode_workers):
+            inferred_q.put(_DONE)
+
+    def encode_loop():
+        while True:
+            entry = inferred_q.get()
+            if entry is _DONE:
+                results_q.put(_DONE)
+                return
+            item, decoded, output = entry
+            try:
+                encode(item, decoded, output)
+                results_q.put((item, None))
+            except Exception as e:
+                results_q.put((item, e))
+
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    threads += [threading.Thread(target=decode_loop, name=f"pipeline-decode-{i}", daemon=True)
+                for i in range(decode_workers)]
+    threads.append(threading.Thread(target=infer_loop, name="pipeline-infer", daemon=True))
+    threads += [threading.Thread(target=encode_loop, name=f"pipeline-encode-{i}", daemon=True)
+                for i in range(encode_workers)]
+    for thread in threads:
+        thread.start()
+
+    running = encode_workers
+    while running:
+        result = results_q.get()
+        if result is _DONE:
+            running -= 1
+            continue
+        yield result
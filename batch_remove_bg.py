@@ -3,23 +3,37 @@ import sys
 import argparse
 import importlib.util
 import subprocess
+import threading
+import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, List, Optional
 from tqdm import tqdm
 
+from batch_manifest import (
+    BatchManifest, MANIFEST_NAME, manifest_name, merge_manifests, shard_of, verify_coverage, write_entries
+)
+from engine import ENGINE_BACKEND, ENGINE_BACKENDS, create_engine
+from model_registry import AVAILABLE_MODELS
+
+# 默认模型与rembg不传session时相同
+DEFAULT_BATCH_MODEL = "u2net"
+# 默认后端：未设置 ENGINE_BACKEND 时使用 rembg
+DEFAULT_BACKEND = ENGINE_BACKEND or "rembg"
+
 # 检查rembg是否已安装
 def check_rembg():
     try:
         if importlib.util.find_spec("rembg") is not None:
-            from rembg import remove
-            from PIL import Image
-            return True, remove, Image, None
+            # 推理通过 engine.create_engine 进行，这里只检查能否导入
+            import rembg  # noqa: F401
+            return True, None
         else:
-            return False, None, None, "rembg模块未找到"
+            return False, "rembg模块未找到"
     except ImportError as e:
-        return False, None, None, f"导入错误: {str(e)}"
+        return False, f"导入错误: {str(e)}"
     except Exception as e:
-        return False, None, None, f"未知错误: {str(e)}"
+        return False, f"未知错误: {str(e)}"
 
 # 尝试安装rembg
 def install_rembg():
@@ -40,7 +54,7 @@ def check_environment():
     print(f"Python路径: {sys.executable}")
     
     # 检查rembg
-    rembg_available, _, _, error_msg = check_rembg()
+    rembg_available, error_msg = check_rembg()
     if rembg_available:
         print("rembg: 已安装")
         try:
@@ -69,53 +83,209 @@ def check_environment():
     print("\n如需更详细的诊断，请运行: python diagnose.py")
 
 # 获取rembg状态
-REMBG_AVAILABLE, remove_func, Image, error_msg = check_rembg()
+REMBG_AVAILABLE, error_msg = check_rembg()
+
+# 每个工作线程（或进程）持有自己的引擎，只在启动时加载一次模型
+_worker = threading.local()
+_worker_backend = DEFAULT_BACKEND
+_worker_model = DEFAULT_BATCH_MODEL
 
-def process_image(input_path: Path, output_dir: Path) -> bool:
+def backend_available(backend: str) -> bool:
+    """后端依赖是否可用（onnx 后端只依赖 onnxruntime，不需要 rembg）"""
+    return backend != "rembg" or REMBG_AVAILABLE
+
+def init_worker(backend: str, model_name: str, threads_per_process: int = 0):
+    """线程池/进程池的初始化函数：记录后端和模型名并预先创建引擎
+
+    进程模式下传入 threads_per_process，限制每个进程内ONNX运行时的线程数，避免多进程抢占CPU。
+    """
+    global _worker_backend, _worker_model
+    if threads_per_process:
+        os.environ.setdefault("OMP_NUM_THREADS", str(threads_per_process))
+        os.environ.setdefault("ORT_INTRA_OP_THREADS", str(threads_per_process))
+    _worker_backend = backend
+    _worker_model = model_name
+    if backend_available(backend):
+        get_engine()
+
+def get_engine():
+    """当前工作线程的去背景引擎"""
+    engine = getattr(_worker, "engine", None)
+    if engine is None:
+        engine = _worker.engine = create_engine(_worker_backend, _worker_model)
+    return engine
+
+# 支持的图片格式
+SUPPORTED_FORMATS = {'.png', '.jpg', '.jpeg', '.bmp', '.webp'}
+
+def collect_images(input_dir: Path, recursive: bool = False, exclude: Optional[Path] = None) -> List[Path]:
+    """列出目录下支持格式的图片（按路径排序）；recursive 时遍历子目录，跳过 exclude（输出目录）"""
+    if not recursive:
+        return sorted(f for f in input_dir.iterdir() if f.is_file() and f.suffix.lower() in SUPPORTED_FORMATS)
+
+    exclude = exclude.resolve() if exclude is not None else None
+    image_files = []
+    for root, dirs, files in os.walk(input_dir):
+        root_path = Path(root)
+        dirs[:] = sorted(d for d in dirs if (root_path / d).resolve() != exclude)
+        image_files.extend(root_path / f for f in sorted(files) if Path(f).suffix.lower() in SUPPORTED_FORMATS)
+    return image_files
+
+def output_path_for(rel_path: Path, output_dir: Path) -> Path:
+    """输入图片（相对输入目录的路径）对应的输出路径，子目录结构保持不变"""
+    return output_dir / rel_path.parent / f"{rel_path.stem}_nobg.png"
+
+def report_error(input_path: Path, e: Exception):
+    """打印处理失败的原因和可能的解决办法"""
+    if isinstance(e, FileNotFoundError):
+        print(f"\n错误: 找不到文件 '{input_path}'")
+    elif isinstance(e, PermissionError):
+        print(f"\n错误: 没有权限读取或写入文件 '{input_path}'")
+    else:
+        print(f"\n处理 {input_path.name} 时出错: {str(e)}")
+        
+        # 添加更多诊断信息
+        if "No module named 'rembg'" in str(e):
+            print("可能的原因: rembg库未正确安装或在不同的Python环境中")
+        elif "No module named" in str(e):
+            print("可能的原因: 缺少依赖库")
+        elif "memory" in str(e).lower():
+            print("可能的原因: 内存不足，尝试减少同时处理的图片数量")
+
+def process_image(input_path: Path, output_path: Path) -> Optional[str]:
     """
     处理单张图片，移除背景并保存结果
     
     Args:
         input_path: 输入图片路径
-        output_dir: 输出目录路径
+        output_path: 输出图片路径
     
     Returns:
-        bool: 处理是否成功
+        Optional[str]: 失败时的错误信息，成功时为None
     """
-    if not REMBG_AVAILABLE:
+    if not backend_available(_worker_backend):
         print(f"错误: {error_msg}")
-        return False
+        return error_msg
         
     try:
-        # 准备输出路径
-        output_path = output_dir / f"{input_path.stem}_nobg.png"
-        
-        # 读取并处理图片
-        input_image = Image.open(input_path)
-        output_image = remove_func(input_image)
+        # 读取并处理图片（推理使用缩小解码的图片，全分辨率只用于合成）
+        output_image = get_engine().remove_background_file(str(input_path))
         
         # 保存结果
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         output_image.save(output_path)
-        return True
+        return None
         
-    except FileNotFoundError:
-        print(f"\n错误: 找不到文件 '{input_path}'")
-        return False
-    except PermissionError:
-        print(f"\n错误: 没有权限读取或写入文件 '{input_path}'")
-        return False
     except Exception as e:
-        print(f"\n处理 {input_path.name} 时出错: {str(e)}")
-        
-        # 添加更多诊断信息
-        if "No module named 'rembg'" in str(e):
-            print("可能的原因: rembg库未正确安装或在不同的Python环境中")
-        elif "No module named" in str(e):
-            print("可能的原因: 缺少依赖库")
-        elif "memory" in str(e).lower():
-            print("可能的原因: 内存不足，尝试减少同时处理的图片数量")
-        
+        report_error(input_path, e)
+        return str(e)
+
+def run_pipeline_batch(tasks, workers: int, model: str = DEFAULT_BATCH_MODEL, batch_size: int = 4,
+                       progress: bool = True, on_done: Optional[Callable] = None,
+                       backend: str = DEFAULT_BACKEND):
+    """流水线模式：workers 个解码线程 -> 一个推理线程 -> workers 个编码写出线程
+
+    tasks 为（输入路径, 输出路径）列表。文件读取/解码和PNG编码/写文件与推理重叠进行，
+    阶段之间的队列有容量上限，目录中有数万张图片时内存占用也保持稳定。
+    每张图片完成后调用 on_done(task, 错误信息或None)。返回（成功数, 失败数, 耗时秒）。
+    """
+    from batch_pipeline import run_pipeline as run_stages
+
+    engine = create_engine(backend, model)
+
+    def decode(task):
+        return engine.decode(str(task[0]))
+
+    def infer_masks(decoded_list):
+        # onnx 后端整批送入模型；rembg 没有批量推理接口，同一批在推理线程中逐张运行
+        return engine.predict_masks(
+            [image for image, _, _ in decoded_list], [size for _, size, _ in decoded_list]
+        )
+
+    def encode(task, decoded, mask):
+        input_path, output_path = task
+        image, _, is_full = decoded
+        output_image = engine.compose(str(input_path), image, is_full, mask)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_image.save(output_path)
+
+    successful = 0
+    failed = 0
+    start = time.perf_counter()
+    results = run_stages(tasks, decode, infer_masks, encode, decode_workers=workers,
+                         encode_workers=workers, batch_size=batch_size)
+    for task, error in tqdm(results, total=len(tasks), desc="处理进度", unit="张", disable=not progress):
+        if error is None:
+            successful += 1
+        else:
+            failed += 1
+            report_error(task[0], error)
+        if on_done is not None:
+            on_done(task, None if error is None else str(error))
+    return successful, failed, time.perf_counter() - start
+
+def run_batch(tasks, workers: int, mode: str = "thread", model: str = DEFAULT_BATCH_MODEL,
+              progress: bool = True, on_done: Optional[Callable] = None, backend: str = DEFAULT_BACKEND):
+    """用线程池或进程池处理图片，返回（成功数, 失败数, 耗时秒）
+
+    tasks 为（输入路径, 输出路径）列表，每张图片完成后调用 on_done(task, 错误信息或None)。
+    两种模式下每个worker都在初始化时创建一次引擎；进程模式不受GIL限制，
+    可以在多核上并行解码、编码和推理，代价是每个进程各加载一份模型。
+    """
+    if mode == "process":
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(backend, model, 1))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(backend, model))
+
+    successful = 0
+    failed = 0
+    start = time.perf_counter()
+    with executor:
+        futures = [executor.submit(process_image, *task) for task in tasks]
+        for task, future in tqdm(zip(tasks, futures), total=len(tasks), desc="处理进度", unit="张",
+                                 disable=not progress):
+            error = future.result()
+            if error is None:
+                successful += 1
+            else:
+                failed += 1
+            if on_done is not None:
+                on_done(task, error)
+    return successful, failed, time.perf_counter() - start
+
+def default_output_dir(args) -> Path:
+    input_dir = Path(args.input_dir)
+    if args.output_dir:
+        return Path(args.output_dir)
+    return input_dir.parent / f"{input_dir.name}_nobg"
+
+def merge_shards(args) -> bool:
+    """合并输出目录中的分片清单，校验输入目录中的每张图片都已成功处理，返回是否完整"""
+    input_dir = Path(args.input_dir)
+    output_dir = default_output_dir(args)
+    if not input_dir.exists():
+        print(f"错误: 输入目录 '{input_dir}' 不存在")
         return False
+    
+    image_files = collect_images(input_dir, args.recursive, exclude=output_dir)
+    expected = {f.relative_to(input_dir).as_posix(): f for f in image_files}
+    entries = merge_manifests(output_dir)
+    problems = verify_coverage(entries, expected, output_dir, {"model": args.model, "backend": args.backend})
+    write_entries(output_dir / MANIFEST_NAME, (entries[path] for path in sorted(entries)))
+    
+    labels = {"missing": "未处理", "failed": "处理失败", "stale": "输入已修改或选项不同", "output_missing": "输出文件缺失"}
+    incomplete = sum(len(paths) for paths in problems.values())
+    print(f"图片总数: {len(expected)}")
+    print(f"已完成: {len(expected) - incomplete}")
+    for kind, paths in problems.items():
+        if paths:
+            print(f"{labels[kind]}: {len(paths)}（例如 {', '.join(paths[:5])}）")
+    print(f"合并后的清单: {output_dir / MANIFEST_NAME}")
+    if incomplete:
+        print("覆盖不完整：用相同的分片参数重新运行对应节点即可补齐")
+    else:
+        print("所有图片均已成功处理")
+    return incomplete == 0
 
 def main():
     # 解析命令行参数
@@ -123,6 +293,23 @@ def main():
     parser.add_argument('input_dir', type=str, nargs='?', help='输入图片所在目录')
     parser.add_argument('--output-dir', '-o', type=str, help='输出目录（默认为input_dir_nobg）')
     parser.add_argument('--workers', '-w', type=int, default=2, help='同时处理的图片数量（默认为2）')
+    parser.add_argument('--model', '-m', type=str, default=DEFAULT_BATCH_MODEL, choices=AVAILABLE_MODELS,
+                        help=f'使用的模型（默认为{DEFAULT_BATCH_MODEL}）')
+    parser.add_argument('--backend', type=str, default=DEFAULT_BACKEND, choices=ENGINE_BACKENDS,
+                        help=f'推理后端：rembg 或 onnx（直接运行 MODELS_DIR 中的ONNX模型，不需要rembg），'
+                             f'默认为{DEFAULT_BACKEND}（可用环境变量 ENGINE_BACKEND 设置）')
+    parser.add_argument('--mode', type=str, default='thread', choices=['thread', 'process', 'pipeline'],
+                        help='并行方式：thread 线程池（默认），process 进程池（多核扩展，每个进程加载一份模型），'
+                             'pipeline 解码/推理/编码分阶段流水线（workers 为解码和编码线程数）')
+    parser.add_argument('--batch-size', type=int, default=4, help='流水线模式下每批推理的最大图片数（默认为4）')
+    parser.add_argument('--recursive', '-r', action='store_true', help='递归处理子目录中的图片（输出保持相同的目录结构）')
+    parser.add_argument('--hash', action='store_true',
+                        help='在清单中记录内容哈希，修改时间变化但内容未变的图片也会跳过')
+    parser.add_argument('--force', action='store_true', help='忽略清单，重新处理所有图片')
+    parser.add_argument('--shard-index', type=int, help='当前节点处理的分片序号（从0开始）')
+    parser.add_argument('--shard-count', type=int, help='分片总数（按相对路径的稳定哈希划分图片）')
+    parser.add_argument('--merge', action='store_true',
+                        help='合并各分片清单为 manifest.jsonl，并校验所有图片都已成功处理（不处理图片）')
     parser.add_argument('--check', action='store_true', help='检查环境和依赖')
     parser.add_argument('--install', action='store_true', help='安装rembg库')
     args = parser.parse_args()
@@ -143,8 +330,17 @@ def main():
         parser.print_help()
         return
     
-    # 检查rembg是否可用
-    if not REMBG_AVAILABLE:
+    # 检查分片参数
+    if (args.shard_index is None) != (args.shard_count is None):
+        parser.error("--shard-index 和 --shard-count 需要同时指定")
+    if args.shard_count is not None and not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index 取值范围为 0 到 shard-count-1")
+    
+    if args.merge:
+        sys.exit(0 if merge_shards(args) else 1)
+    
+    # 检查rembg是否可用（只有rembg后端需要）
+    if not backend_available(args.backend):
         print(f"错误: {error_msg}")
         print("rembg库未正确安装。")
         
@@ -164,10 +360,7 @@ def main():
         print(f"错误: 输入目录 '{input_dir}' 不存在")
         return
     
-    if args.output_dir:
-        output_dir = Path(args.output_dir)
-    else:
-        output_dir = input_dir.parent / f"{input_dir.name}_nobg"
+    output_dir = default_output_dir(args)
     
     # 创建输出目录
     try:
@@ -180,9 +373,8 @@ def main():
         return
     
     # 获取所有支持的图片文件
-    supported_formats = {'.png', '.jpg', '.jpeg', '.bmp', '.webp'}
     try:
-        image_files = [f for f in input_dir.iterdir() if f.suffix.lower() in supported_formats]
+        image_files = collect_images(input_dir, args.recursive, exclude=output_dir)
     except PermissionError:
         print(f"错误: 没有权限读取目录 '{input_dir}'")
         return
@@ -192,43 +384,82 @@ def main():
     
     if not image_files:
         print(f"在 {input_dir} 中没有找到支持的图片文件")
-        print(f"支持的格式: {', '.join(supported_formats)}")
+        print(f"支持的格式: {', '.join(SUPPORTED_FORMATS)}")
         return
     
-    print(f"找到 {len(image_files)} 个图片文件")
+    # 分片运行时只处理属于本分片的图片
+    total_files = len(image_files)
+    if args.shard_count is not None:
+        image_files = [
+            f for f in image_files
+            if shard_of(f.relative_to(input_dir).as_posix(), args.shard_count) == args.shard_index
+        ]
+    
+    # 对照清单跳过未变化且已成功处理的图片，只处理新增、修改过和上次失败的
+    manifest = BatchManifest(
+        output_dir / manifest_name(args.shard_index, args.shard_count),
+        options={"model": args.model, "backend": args.backend}, use_hash=args.hash
+    )
+    tasks = []
+    fingerprints = {}
+    for input_path in image_files:
+        rel_path = input_path.relative_to(input_dir)
+        output_path = output_path_for(rel_path, output_dir)
+        if args.force:
+            fingerprint = manifest.fingerprint(input_path)
+        else:
+            fingerprint = manifest.needs_processing(rel_path.as_posix(), input_path, output_path)
+        if fingerprint is not None:
+            tasks.append((input_path, output_path))
+            fingerprints[input_path] = (rel_path.as_posix(), fingerprint)
+    skipped = len(image_files) - len(tasks)
+
+    def on_done(task, error):
+        rel_path, fingerprint = fingerprints[task[0]]
+        if error is None:
+            manifest.record(rel_path, fingerprint, "done", output=task[1].relative_to(output_dir).as_posix())
+        else:
+            manifest.record(rel_path, fingerprint, "failed", error=error)
+
+    print(f"找到 {total_files} 个图片文件")
+    if args.shard_count is not None:
+        print(f"分片 {args.shard_index}/{args.shard_count}: {len(image_files)} 个图片文件")
+    if skipped:
+        print(f"跳过 {skipped} 个已处理且未变化的文件（见 {manifest.path}）")
+    if not tasks:
+        manifest.close()
+        print("没有需要处理的图片")
+        return
     print(f"输出目录: {output_dir}")
-    print(f"处理线程数: {args.workers}")
+    print(f"使用模型: {args.model}（{args.backend} 后端）")
+    print(f"处理{'进程' if args.mode == 'process' else '线程'}数: {args.workers}")
     print("\n开始处理...")
     
-    # 使用线程池处理图片
-    successful = 0
-    failed = 0
-    
     try:
-        with ThreadPoolExecutor(max_workers=args.workers) as executor:
-            # 创建进度条
-            futures = []
-            for img_path in image_files:
-                future = executor.submit(process_image, img_path, output_dir)
-                futures.append(future)
-            
-            # 显示进度
-            for future in tqdm(futures, desc="处理进度", unit="张"):
-                if future.result():
-                    successful += 1
-                else:
-                    failed += 1
+        if args.mode == 'pipeline':
+            successful, failed, elapsed = run_pipeline_batch(
+                tasks, args.workers, args.model, args.batch_size, on_done=on_done, backend=args.backend
+            )
+        else:
+            successful, failed, elapsed = run_batch(
+                tasks, args.workers, args.mode, args.model, on_done=on_done, backend=args.backend
+            )
     except KeyboardInterrupt:
-        print("\n处理被用户中断")
+        print("\n处理被用户中断（已完成的图片记录在清单中，重新运行会从中断处继续）")
         return
     except Exception as e:
         print(f"\n处理过程中出错: {str(e)}")
         return
+    finally:
+        manifest.close()
     
     # 显示处理结果
     print("\n处理完成!")
     print(f"成功: {successful} 张")
     print(f"失败: {failed} 张")
+    if skipped:
+        print(f"跳过: {skipped} 张")
+    print(f"耗时: {elapsed:.1f} 秒（{len(tasks) / elapsed if elapsed else 0:.2f} 张/秒，{args.mode} 模式）")
     print(f"处理结果已保存到: {output_dir}")
     
     if failed > 0:
@@ -0,0 +1,147 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from engine import Engine
+
+if TYPE_CHECKING:
+    # 只用于类型标注：导入本模块（读取 BATCH_MAX_SIZE）时不加载numpy和onnxruntime
+    import numpy as np
+    from background_remover import BackgroundRemover
+
+# 单次批量推理的最大图片数（1表示不合批）和凑批最长等待时间
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+
+class BatchScheduler(Engine):
+    """动态合批调度器
+
+    并发请求先进入队列，调度线程收集最多 max_batch_size 个请求或等待 max_wait_ms 后，
+    合并为一次批量推理，再把每个请求自己的预测结果交给对应的 Future。
+    mask放大、边缘细化、合成等与图片尺寸相关的后处理仍在调用方线程中并行完成。
+    与 BackgroundRemover 一样实现 Engine 接口，可直接替换。
+    """
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        remover: "BackgroundRemover",
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+    ):
+        self.remover = remover
+        self.refine_edges = remover.refine_edges
+        self.decode_min_size = remover.decode_min_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+        self.batches = 0
+        self.images = 0
+
+    def predict(self, image: Image.Image) -> "Future[np.ndarray]":
+        """提交一张图片，返回其预测结果（1x1xHxW）的 Future"""
+        future: "Future[np.ndarray]" = Future()
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put((image, future))
+        if closed:
+            # 调度器已关闭（如模型被淘汰），直接在调用方线程推理
+            future.set_running_or_notify_cancel()
+            self._run([(image, future)])
+        return future
+
+    def predict_mask(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """推理与其他并发请求合批执行，返回尺寸为 size 的mask"""
+        return self.remover._postprocess(self.predict(image).result(), size)
+
+    def predict_masks(
+        self, images: List[Image.Image], sizes: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> List[Image.Image]:
+        """先提交全部图片再等待结果，同一调用中的图片可以合进同一批"""
+        sizes = sizes or [image.size for image in images]
+        futures = [self.predict(image) for image in images]
+        return [self.remover._postprocess(future.result(), size) for future, size in zip(futures, sizes)]
+
+    def _collect(self, first: tuple) -> tuple:
+        """从队列中凑一批请求，返回（请求列表, 是否收到停止信号）"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self, batch: list) -> None:
+        """对一批请求执行一次推理，并把结果分发给各自的 Future"""
+        try:
+            preds = self.remover._predict(self.remover._preprocess_batch([image for image, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.images += len(batch)
+        for i, (_, future) in enumerate(batch):
+            future.set_result(preds[i:i + 1])
+
+    def _loop(self) -> None:
+        stopped = False
+        while not stopped:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopped = self._collect(first)
+
+            # 已取消的请求不再推理
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._run(batch)
+
+        # 与停止信号同时进入队列的请求
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[1].set_running_or_notify_cancel():
+                self._run([item])
+
+    def close(self) -> None:
+        """停止调度线程（已在队列中的请求会先处理完）"""
+        with self._lock:
+            self._closed = True
+            self._queue.put(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """合批统计"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "images": self.images,
+            "avg_batch_size": self.images / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+推理后端对比基准
+
+用同一批图片（--images-dir 中的图片，或合成JPEG）依次运行各个后端（engine.create_engine），
+输出每个后端的单张延迟（中位数/P95）和吞吐（张/秒），并以第一个后端的结果为参照，
+比较其余后端的mask一致性：mask按127二值化后的IoU，以及灰度mask的平均绝对差（0-255）。
+所有后端共用同一套缩小解码、mask放大和合成流程，差异只来自mask预测本身。
+
+用法:
+    python benchmarks/bench_backends.py [--backends onnx rembg] [--model u2netp]
+                                        [--images-dir photos/] [--output result.json]
+"""
+
+import argparse
+import io
+import json
+import statistics
+import time
+from pathlib import Path
+
+from common import size_for_megapixels, synthetic_image
+
+import numpy as np
+
+from engine import ENGINE_BACKENDS, create_engine
+
+# --images-dir 中参与对比的图片格式
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp', '.webp'}
+
+
+def load_corpus(args) -> list:
+    """返回（名称, 图片字节）列表"""
+    if args.images_dir:
+        paths = sorted(p for p in Path(args.images_dir).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        return [(p.name, p.read_bytes()) for p in paths[:args.images or None]]
+
+    corpus = []
+    size = size_for_megapixels(args.megapixels)
+    for i in range(args.images or 8):
+        buffer = io.BytesIO()
+        synthetic_image(size, seed=i).save(buffer, 'JPEG', quality=90)
+        corpus.append((f"synthetic_{i:03d}.jpg", buffer.getvalue()))
+    return corpus
+
+
+def run_backend(engine, corpus: list) -> dict:
+    engine.remove_background_file(corpus[0][1], mask_only=True)  # 预热
+    latencies = []
+    masks = []
+    start = time.perf_counter()
+    for _, data in corpus:
+        begin = time.perf_counter()
+        # 完整流程（解码、推理、合成），mask单独保留用于一致性比较
+        image, original_size, is_full = engine.decode(data)
+        mask = engine.predict_mask(image, original_size)
+        engine.compose(data, image, is_full, mask)
+        latencies.append(time.perf_counter() - begin)
+        masks.append(np.asarray(mask, dtype=np.uint8))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "latency_ms": {
+            "median": statistics.median(latencies) * 1000,
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        },
+        "images_per_second": len(corpus) / elapsed,
+        "masks": masks,
+    }
+
+
+def mask_agreement(reference: list, masks: list) -> dict:
+    """两组mask的一致性：二值化IoU（均值和最小值）与平均绝对差"""
+    ious = []
+    diffs = []
+    for ref, mask in zip(reference, masks):
+        a, b = ref > 127, mask > 127
+        union = np.logical_or(a, b).sum()
+        ious.append(float(np.logical_and(a, b).sum() / union) if union else 1.0)
+        diffs.append(float(np.abs(ref.astype(np.int16) - mask.astype(np.int16)).mean()))
+    return {"iou_mean": statistics.mean(ious), "iou_min": min(ious), "mean_abs_diff": statistics.mean(diffs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推理后端对比基准')
+    parser.add_argument('--backends', nargs='+', default=ENGINE_BACKENDS, choices=ENGINE_BACKENDS,
+                        help='参与对比的后端（第一个作为一致性参照）')
+    parser.add_argument('--model', type=str, default='u2netp', help='模型名（两个后端使用同名模型）')
+    parser.add_argument('--models-dir', type=str, default=None, help='onnx 后端的模型目录（默认为 MODELS_DIR）')
+    parser.add_argument('--images-dir', type=str, default=None, help='图片目录（默认使用合成JPEG）')
+    parser.add_argument('--images', type=int, default=0, help='图片数量（0表示目录中全部，合成时默认8张）')
+    parser.add_argument('--megapixels', type=float, default=2, help='合成图片大小（百万像素）')
+    parser.add_argument('--output', type=str, default=None, help='把结果另存为JSON文件')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    if not corpus:
+        print("没有可用的图片")
+        return
+
+    results = {}
+    reference = None
+    print(f"{'后端':>6} {'中位延迟 ms':>12} {'P95 ms':>9} {'张/秒':>8} {'IoU均值':>8} {'IoU最小':>8} {'平均差':>7}")
+    for backend in args.backends:
+        try:
+            engine = create_engine(backend, args.model, models_dir=args.models_dir)
+        except Exception as e:
+            print(f"{backend:>6} 无法创建: {e}")
+            continue
+        result = run_backend(engine, corpus)
+        engine.close()
+        masks = result.pop("masks")
+        if reference is None:
+            reference = masks
+        result["agreement"] = mask_agreement(reference, masks)
+        results[backend] = result
+
+        agreement = result["agreement"]
+        print(f"{backend:>6} {result['latency_ms']['median']:>12.1f} {result['latency_ms']['p95']:>9.1f} "
+              f"{result['images_per_second']:>8.2f} {agreement['iou_mean']:>8.3f} {agreement['iou_min']:>8.3f} "
+              f"{agreement['mean_abs_diff']:>7.2f}")
+
+    if args.output:
+        report = {"model": args.model, "images": [name for name, _ in corpus], "backends": results}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+批量推理吞吐基准
+
+对比 BackgroundRemover.remove_background_batch 在不同batch大小下的CPU吞吐（张/秒）。
+
+用法:
+    python benchmarks/bench_batch.py [--model models/u2netp.onnx] [--batch-sizes 1 4 8 16]
+"""
+
+import argparse
+import time
+
+from common import DEFAULT_MODEL, synthetic_image
+
+from background_remover import BackgroundRemover
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量推理吞吐基准')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='ONNX模型路径')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16], help='batch大小')
+    parser.add_argument('--images', type=int, default=32, help='每种batch大小处理的图片总数')
+    parser.add_argument('--size', type=int, nargs=2, default=[1024, 768], help='输入图像尺寸（宽 高）')
+    args = parser.parse_args()
+
+    remover = BackgroundRemover(args.model)
+    if not remover.dynamic_batch:
+        print("注意: 模型batch维度固定为1，批量接口会退化为逐张推理")
+
+    images = [synthetic_image(tuple(args.size), seed=i) for i in range(args.images)]
+
+    # 预热
+    remover.remove_background_batch(images[:1])
+
+    print(f"{'batch':>6} {'总耗时 s':>10} {'张/秒':>8} {'ms/张':>8}")
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, len(images), batch_size):
+            remover.remove_background_batch(images[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>6} {elapsed:>10.2f} {len(images) / elapsed:>8.1f} "
+              f"{elapsed / len(images) * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
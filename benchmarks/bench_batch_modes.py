@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+批量处理并行方式基准
+
+在临时目录中生成合成JPEG，分别用 batch_remove_bg.py 的线程池、进程池和流水线模式、不同worker数处理，
+输出每种组合的吞吐（张/秒）。rembg 后端需要安装 rembg，onnx 后端从 MODELS_DIR 加载模型。
+
+用法:
+    python benchmarks/bench_batch_modes.py [--images 32] [--workers 1 2 4] [--model u2netp] [--backend rembg]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from common import size_for_megapixels, synthetic_image
+
+from batch_remove_bg import (
+    DEFAULT_BACKEND, backend_available, error_msg, output_path_for, run_batch, run_pipeline_batch
+)
+from engine import ENGINE_BACKENDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量处理并行方式基准')
+    parser.add_argument('--images', type=int, default=32, help='合成图片数量')
+    parser.add_argument('--megapixels', type=float, default=2, help='每张图片大小（百万像素）')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, os.cpu_count() or 1}), help='worker数')
+    parser.add_argument('--modes', nargs='+', default=['thread', 'process', 'pipeline'], help='并行方式')
+    parser.add_argument('--batch-size', type=int, default=4, help='流水线模式每批推理的最大图片数')
+    parser.add_argument('--model', type=str, default='u2netp', help='模型名')
+    parser.add_argument('--backend', type=str, default=DEFAULT_BACKEND, choices=ENGINE_BACKENDS, help='推理后端')
+    args = parser.parse_args()
+
+    if not backend_available(args.backend):
+        print(f"错误: {error_msg}")
+        return
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    input_dir = tmp_dir / "input"
+    input_dir.mkdir()
+    size = size_for_megapixels(args.megapixels)
+    image_files = []
+    for i in range(args.images):
+        path = input_dir / f"{i:05d}.jpg"
+        synthetic_image(size, seed=i).save(path, 'JPEG', quality=90)
+        image_files.append(path)
+
+    print(f"{'模式':>8} {'worker':>7} {'成功':>5} {'耗时 s':>8} {'张/秒':>8}")
+    try:
+        for mode in args.modes:
+            for workers in args.workers:
+                output_dir = tmp_dir / f"{mode}_{workers}"
+                tasks = [(path, output_path_for(path.relative_to(input_dir), output_dir)) for path in image_files]
+                if mode == 'pipeline':
+                    successful, _, elapsed = run_pipeline_batch(
+                        tasks, workers, args.model, args.batch_size, progress=False, backend=args.backend
+                    )
+                else:
+                    successful, _, elapsed = run_batch(
+                        tasks, workers, mode, args.model, progress=False, backend=args.backend
+                    )
+                print(f"{mode:>8} {workers:>7} {successful:>5} {elapsed:>8.2f} {args.images / elapsed:>8.2f}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
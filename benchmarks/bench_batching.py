@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+动态合批负载测试
+
+用多个并发客户端线程模拟API请求，对比直接调用 BackgroundRemover（每个请求一次推理）
+与经过 BatchScheduler 合批后的 p50/p99 延迟和吞吐（张/秒）。
+
+用法:
+    python benchmarks/bench_batching.py [--clients 16] [--batch-sizes 4 8 16] [--wait-ms 5 10 20]
+"""
+
+import argparse
+import itertools
+import threading
+import time
+
+import numpy as np
+
+from common import DEFAULT_MODEL, synthetic_image
+
+from background_remover import BackgroundRemover
+from batch_scheduler import BatchScheduler
+
+
+def load_test(target, images, clients: int, requests_per_client: int):
+    """返回（每个请求的延迟列表秒, 总耗时秒）"""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients + 1)
+
+    def client(index):
+        barrier.wait()
+        local = []
+        for i in range(requests_per_client):
+            image = images[(index + i) % len(images)]
+            start = time.perf_counter()
+            target.remove_background(image)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def report(name: str, latencies, elapsed: float, extra: str = "") -> None:
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{name:>22} {p50:>8.1f} {p99:>8.1f} {len(latencies) / elapsed:>8.1f} {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='动态合批负载测试')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='ONNX模型路径')
+    parser.add_argument('--clients', type=int, default=16, help='并发客户端数')
+    parser.add_argument('--requests', type=int, default=8, help='每个客户端的请求数')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[4, 8, 16], help='最大batch大小')
+    parser.add_argument('--wait-ms', type=float, nargs='+', default=[5, 10, 20], help='凑批最长等待时间')
+    parser.add_argument('--size', type=int, nargs=2, default=[1024, 768], help='输入图像尺寸（宽 高）')
+    args = parser.parse_args()
+
+    remover = BackgroundRemover(args.model)
+    images = [synthetic_image(tuple(args.size), seed=i) for i in range(8)]
+    remover.remove_background(images[0])  # 预热
+
+    print(f"{'模式':>22} {'p50 ms':>8} {'p99 ms':>8} {'张/秒':>8}")
+    latencies, elapsed = load_test(remover, images, args.clients, args.requests)
+    report("不合批", latencies, elapsed)
+
+    for batch_size, wait_ms in itertools.product(args.batch_sizes, args.wait_ms):
+        scheduler = BatchScheduler(remover, max_batch_size=batch_size, max_wait_ms=wait_ms)
+        latencies, elapsed = load_test(scheduler, images, args.clients, args.requests)
+        scheduler.close()
+        report(f"batch≤{batch_size} 等待{wait_ms:g}ms", latencies, elapsed,
+               f"(平均batch {scheduler.stats()['avg_batch_size']:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+API服务冷启动基准与导入耗时分析
+
+每次在新的Python进程中导入 api_server（与Serverless冷启动相同），分别测量各 WARMUP_MODE 下：
+模块导入耗时、导入后第一个 /api/status 响应和第一个去背景响应的耗时，以及进程启动到第一个
+去背景响应的总耗时（含解释器启动）。另外用 python -X importtime 运行一次，按顶层包汇总导入耗时，
+并列出自身耗时最长的模块，用于找出还能推迟或去掉的导入。需要安装 httpx（FastAPI 的 TestClient）。
+
+用法:
+    python benchmarks/bench_cold_start.py [--modes eager background lazy] [--repeat 5] [--top 15]
+                                          [--output cold_start.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT_DIR, size_for_megapixels, synthetic_image
+
+# 子进程中运行的代码：导入服务并依次发出第一个状态请求和第一个去背景请求
+CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import api_server
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(api_server.app)
+client_ready = time.perf_counter()
+client.get("/api/status")
+status_done = time.perf_counter()
+with open(sys.argv[1], "rb") as f:
+    response = client.post("/api/remove-background", files={"file": ("image.jpg", f.read(), "image/jpeg")})
+inference_done = time.perf_counter()
+print(json.dumps({
+    "ok": response.status_code == 200 and response.json()["code"] == 0,
+    "import_ms": (imported - start) * 1000,
+    "first_status_ms": (status_done - client_ready) * 1000,
+    "first_inference_ms": (inference_done - status_done) * 1000,
+}))
+"""
+# 导入耗时分析用的代码：只导入服务并加载默认模型（包含延迟到首次请求的导入，不含测试客户端）
+PROFILE_CODE = "import api_server; api_server.model_registry.get(None)"
+
+
+def run_child(mode: str, args: list) -> subprocess.CompletedProcess:
+    env = dict(os.environ, WARMUP_MODE=mode, PYTHONPATH=ROOT_DIR)
+    return subprocess.run([sys.executable] + args, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+
+
+def measure(mode: str, image_path: str, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run_child(mode, ["-c", CHILD_CODE, image_path])
+        wall_ms = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "子进程失败")
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        # 解释器退出耗时很短，进程总耗时近似为进程启动到第一个去背景响应
+        run["process_to_first_inference_ms"] = wall_ms
+        runs.append(run)
+    keys = ["import_ms", "first_status_ms", "first_inference_ms", "process_to_first_inference_ms"]
+    report = {key: statistics.median(run[key] for run in runs) for key in keys}
+    report["ok"] = all(run["ok"] for run in runs)
+    return report
+
+
+def parse_importtime(stderr: str) -> list:
+    """解析 -X importtime 的输出，返回（模块名, 自身耗时ms, 累计耗时ms）列表"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def import_profile(mode: str, top: int) -> dict:
+    """按顶层包汇总导入 api_server 并加载默认模型过程中所有导入的自身耗时"""
+    result = run_child(mode, ["-X", "importtime", "-c", PROFILE_CODE])
+    modules = parse_importtime(result.stderr)
+    packages = {}
+    for name, self_ms, _ in modules:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_ms
+    return {
+        "total_ms": sum(self_ms for _, self_ms, _ in modules),
+        "packages": dict(sorted(packages.items(), key=lambda item: -item[1])[:top]),
+        "modules": [
+            {"name": name, "self_ms": self_ms, "cumulative_ms": cumulative_ms}
+            for name, self_ms, cumulative_ms in sorted(modules, key=lambda m: -m[1])[:top]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API服务冷启动基准与导入耗时分析')
+    parser.add_argument('--modes', nargs='+', default=['eager', 'background', 'lazy'], help='WARMUP_MODE')
+    parser.add_argument('--repeat', type=int, default=5, help='每种模式启动的进程数（取中位数）')
+    parser.add_argument('--top', type=int, default=15, help='导入耗时报告中列出的包/模块数')
+    parser.add_argument('--megapixels', type=float, default=1, help='测试图片大小（百万像素）')
+    parser.add_argument('--output', type=str, default=None, help='把结果另存为JSON文件')
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+        synthetic_image(size_for_megapixels(args.megapixels)).save(tmp, 'JPEG', quality=90)
+        image_path = tmp.name
+
+    results = {}
+    try:
+        print(f"{'模式':>10} {'导入 ms':>9} {'首个状态 ms':>11} {'首次推理 ms':>11} {'进程到首次推理 ms':>17}")
+        for mode in args.modes:
+            result = results[mode] = measure(mode, image_path, args.repeat)
+            print(f"{mode:>10} {result['import_ms']:>9.1f} {result['first_status_ms']:>11.1f} "
+                  f"{result['first_inference_ms']:>11.1f} {result['process_to_first_inference_ms']:>17.1f}"
+                  f"{'' if result['ok'] else '  (请求失败)'}")
+    finally:
+        os.unlink(image_path)
+
+    # lazy 模式下先完成服务本身的导入，推理依赖在加载模型时才导入
+    profile_mode = 'lazy' if 'lazy' in args.modes else args.modes[0]
+    profile = import_profile(profile_mode, args.top)
+    print(f"\n导入耗时（{profile_mode} 模式，-X importtime，含加载模型时的延迟导入）: 共 {profile['total_ms']:.1f} ms")
+    print(f"{'顶层包':>24} {'自身耗时 ms':>11}")
+    for package, self_ms in profile['packages'].items():
+        print(f"{package:>24} {self_ms:>11.1f}")
+    print(f"\n{'模块':>40} {'自身 ms':>8} {'累计 ms':>8}")
+    for module in profile['modules']:
+        print(f"{module['name'][-40:]:>40} {module['self_ms']:>8.1f} {module['cumulative_ms']:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"modes": results, "import_profile": {"mode": profile_mode, **profile}},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+合成（mask -> alpha）性能基准
+
+对比旧的逐像素Python循环与 BackgroundRemover.apply_mask 的每百万像素耗时。
+旧实现耗时与像素数成线性关系，大图只计时前若干行再按像素数外推，避免一次跑上几分钟。
+
+用法:
+    python benchmarks/bench_composite.py [--sizes 1 4 12 24] [--legacy-rows 64]
+"""
+
+import argparse
+
+from PIL import Image
+
+from common import best_of, random_mask, size_for_megapixels, synthetic_image
+
+from background_remover import BackgroundRemover
+
+
+def legacy_composite(image: Image.Image, mask: Image.Image, rows: int) -> None:
+    """旧实现：逐像素循环（只处理前 rows 行）"""
+    size = image.size
+    output_image = Image.new('RGBA', size, (0, 0, 0, 0))
+    image = image.convert('RGBA')
+    pixels = image.load()
+    mask_pixels = mask.load()
+    output_pixels = output_image.load()
+    for y in range(min(rows, size[1])):
+        for x in range(size[0]):
+            r, g, b, a = pixels[x, y]
+            output_pixels[x, y] = (r, g, b, int(mask_pixels[x, y]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成性能基准')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 12, 24], help='图像大小（百万像素）')
+    parser.add_argument('--legacy-rows', type=int, default=64, help='旧实现计时的行数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最好成绩）')
+    args = parser.parse_args()
+
+    print(f"{'MP':>6} {'尺寸':>12} {'旧 ms/MP':>10} {'新 ms/MP':>10} {'加速比':>8}")
+    for mp in args.sizes:
+        width, height = size_for_megapixels(mp)
+        image, mask = synthetic_image((width, height)), random_mask((width, height))
+        pixels = width * height / 1e6
+
+        rows = min(args.legacy_rows, height)
+        legacy = best_of(lambda: legacy_composite(image, mask, rows), 1)
+        legacy_per_mp = legacy / (width * rows / 1e6) * 1000
+
+        fast = best_of(lambda: BackgroundRemover.apply_mask(image, mask), args.repeat)
+        fast_per_mp = fast / pixels * 1000
+
+        print(f"{mp:>6g} {f'{width}x{height}':>12} {legacy_per_mp:>10.1f} {fast_per_mp:>10.2f} "
+              f"{legacy_per_mp / fast_per_mp:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+JPEG缩小解码基准
+
+对12MP和24MP的JPEG，对比全分辨率解码与DCT缩放（draft模式）解码的耗时和峰值RSS。
+每种模式在新启动（spawn）的子进程中运行，峰值RSS读取 /proc/self/status 的 VmHWM：
+getrusage 的 ru_maxrss 在Linux上会从主进程继承生成测试图片时的峰值，VmHWM 只统计子进程自身。
+RSS增量为解码过程中的峰值减去解码前的当前RSS。不需要模型文件。
+
+用法:
+    python benchmarks/bench_decode.py [--sizes 12 24] [--min-size 640]
+"""
+
+import argparse
+import io
+import multiprocessing
+
+from common import best_of, peak_rss_bytes, rss_bytes, size_for_megapixels, synthetic_image
+
+from image_io import open_for_inference, open_full
+
+
+def peak_rss_mb() -> float:
+    """本进程的峰值RSS（MB）；无法读取 VmHWM 时（非Linux）退化为 ru_maxrss"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_bytes() / 1024 / 1024
+
+
+def child(mode: str, data: bytes, min_size: int, repeat: int, results) -> None:
+    """在子进程中解码并报告耗时和峰值RSS相对解码前的增量（MB）"""
+    before = rss_bytes() / 1024 / 1024
+    if mode == "full":
+        decode = lambda: open_full(data).load()
+    elif mode == "draft":
+        decode = lambda: open_for_inference(data, min_size)[0].load()
+    else:  # 推理用缩小解码 + 合成用全分辨率解码
+        decode = lambda: (open_for_inference(data, min_size)[0].load(), open_full(data).load())
+    elapsed = best_of(decode, repeat)
+    results.put((elapsed, peak_rss_mb() - before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JPEG缩小解码基准')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[12, 24], help='图像大小（百万像素）')
+    parser.add_argument('--min-size', type=int, default=640, help='缩小解码的最小长边')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最好成绩）')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'MP':>5} {'模式':>14} {'解码 ms':>9} {'峰值RSS增量 MB':>15}")
+    for mp in args.sizes:
+        buffer = io.BytesIO()
+        synthetic_image(size_for_megapixels(mp)).save(buffer, 'JPEG', quality=90)
+        data = buffer.getvalue()
+
+        for mode, label in [("full", "全分辨率"), ("draft", "缩小解码(仅mask)"), ("both", "缩小+全分辨率")]:
+            results = context.Queue()
+            process = context.Process(target=child, args=(mode, data, args.min_size, args.repeat, results))
+            process.start()
+            elapsed, rss = results.get()
+            process.join()
+            print(f"{mp:>5g} {label:>14} {elapsed * 1000:>9.1f} {rss:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
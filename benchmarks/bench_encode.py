@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+输出编码基准
+
+对常见照片尺寸的去背景结果（RGBA），比较各输出格式的编码耗时和字节数：
+旧的 PNG optimize=True、不同 compress_level 的PNG、无损/有损WebP、单通道mask PNG。
+不需要模型文件。
+
+用法:
+    python benchmarks/bench_encode.py [--sizes 1 4 12]
+"""
+
+import argparse
+import io
+
+import numpy as np
+from PIL import Image
+
+from common import best_of, size_for_megapixels, synthetic_image
+
+from image_io import encode_image
+
+# （名称, 编码函数）
+FORMATS = [
+    ("PNG optimize（旧）", lambda image: legacy_png(image)),
+    ("PNG level 1", lambda image: encode_image(image, "png", compress_level=1)),
+    ("PNG level 3", lambda image: encode_image(image, "png", compress_level=3)),
+    ("PNG level 6", lambda image: encode_image(image, "png", compress_level=6)),
+    ("PNG level 9", lambda image: encode_image(image, "png", compress_level=9)),
+    ("WebP 无损", lambda image: encode_image(image, "webp", lossless=True)),
+    ("WebP 有损 q90", lambda image: encode_image(image, "webp", lossless=False, quality=90)),
+    ("WebP 有损 q75", lambda image: encode_image(image, "webp", lossless=False, quality=75)),
+    ("mask PNG level 1", lambda image: encode_image(image, "mask", compress_level=1)),
+    ("mask PNG level 6", lambda image: encode_image(image, "mask", compress_level=6)),
+]
+
+
+def legacy_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def cutout(size: tuple) -> Image.Image:
+    """合成图片加椭圆软边mask，模拟去背景结果"""
+    image = synthetic_image(size)
+    width, height = size
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    distance = np.sqrt(((xx - width / 2) / (width * 0.3)) ** 2 + ((yy - height / 2) / (height * 0.35)) ** 2)
+    alpha = np.clip((1 - distance) * 50 + 0.5, 0, 1)
+    image.putalpha(Image.fromarray((alpha * 255).astype(np.uint8), 'L'))
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description='输出编码基准')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 12], help='图像大小（百万像素）')
+    parser.add_argument('--repeat', type=int, default=2, help='重复次数（取最好成绩）')
+    args = parser.parse_args()
+
+    print(f"{'MP':>5} {'格式':>18} {'编码 ms':>9} {'大小 KB':>9}")
+    for mp in args.sizes:
+        image = cutout(size_for_megapixels(mp))
+        for name, encode in FORMATS:
+            size = len(encode(image))
+            elapsed = best_of(lambda: encode(image), args.repeat)
+            print(f"{mp:>5g} {name:>18} {elapsed * 1000:>9.1f} {size / 1024:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Flask 响应方式基准
+
+对比 app.py 旧的返回方式（写入临时文件 -> send_file 从磁盘读出 -> 删除）与现在的内存编码直接返回，
+测量每个请求的延迟和系统调用数。两条路由使用同一张预先生成的结果图片和相同的PNG压缩级别
+（与API服务相同，默认3），只比较经过磁盘和直接在内存中返回的差异，不需要 rembg 和模型文件。
+系统调用数取自 /proc/self/io 的 syscr/syscw（read/write 类调用），只在Linux上可用。
+
+用法:
+    python benchmarks/bench_flask_response.py [--sizes 1 4 12] [--requests 50]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from common import size_for_megapixels, synthetic_image
+
+from flask import Flask, Response, send_file
+
+from image_io import encode_image, DEFAULT_PNG_COMPRESS_LEVEL
+
+
+def read_io_counters() -> dict:
+    """当前进程的I/O计数（read/write 系统调用次数和字节数）"""
+    counters = {}
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                name, value = line.split(":")
+                counters[name] = int(value)
+    except OSError:
+        pass
+    return counters
+
+
+def create_app(output_image) -> Flask:
+    app = Flask(__name__)
+
+    @app.route("/tempfile", methods=["POST"])
+    def tempfile_response():
+        # 旧实现：结果先写到临时文件，再由 send_file 从磁盘读出（压缩级别与内存方式相同）
+        try:
+            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
+                output_image.save(tmp.name, format="PNG", compress_level=DEFAULT_PNG_COMPRESS_LEVEL)
+                tmp_path = tmp.name
+            return send_file(tmp_path, mimetype="image/png", as_attachment=True, download_name="no-bg.png")
+        finally:
+            if 'tmp_path' in locals() and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @app.route("/memory", methods=["POST"])
+    def memory_response():
+        # 新实现：在内存中编码后直接作为响应体返回
+        return Response(
+            encode_image(output_image, "png", compress_level=DEFAULT_PNG_COMPRESS_LEVEL),
+            mimetype="image/png",
+            headers={"Content-Disposition": "attachment; filename=no-bg.png"},
+        )
+
+    return app
+
+
+def bench(client, path: str, requests: int) -> dict:
+    client.post(path).get_data()  # 预热
+    latencies = []
+    before = read_io_counters()
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.post(path).get_data()
+        latencies.append(time.perf_counter() - start)
+    after = read_io_counters()
+    delta = {name: (after.get(name, 0) - before.get(name, 0)) / requests for name in after}
+    return {
+        "latency_ms": statistics.median(latencies) * 1000,
+        "syscalls": delta.get("syscr", 0) + delta.get("syscw", 0),
+        "written_kb": delta.get("wchar", 0) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask 响应方式基准')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 12], help='图像大小（百万像素）')
+    parser.add_argument('--requests', type=int, default=50, help='每种方式的请求数')
+    args = parser.parse_args()
+
+    if not read_io_counters():
+        print("提示: 无法读取 /proc/self/io，系统调用数将显示为0")
+
+    print(f"{'MP':>5} {'方式':>9} {'延迟 ms':>9} {'read/write调用/请求':>20} {'写入 KB/请求':>13}")
+    for mp in args.sizes:
+        output_image = synthetic_image(size_for_megapixels(mp)).convert("RGBA")
+        client = create_app(output_image).test_client()
+        for path in ("/tempfile", "/memory"):
+            result = bench(client, path, args.requests)
+            print(f"{mp:>5} {path[1:]:>9} {result['latency_ms']:>9.1f} {result['syscalls']:>20.1f} "
+                  f"{result['written_kb']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+mask后处理性能基准
+
+对比旧实现（整张320x320预测含letterbox填充一起LANCZOS放大）与当前实现
+（先裁出图像区域再放大，LANCZOS/双线性两种插值）在宽图和高图上的耗时。
+每种尺寸输出三行，每行只比上一行多一项改动：裁剪+LANCZOS 行的节省只来自裁剪，
+裁剪+双线性 行的节省只来自把插值换成双线性。
+
+用法:
+    python benchmarks/bench_postprocess.py [--model models/u2netp.onnx]
+"""
+
+import argparse
+
+import numpy as np
+from PIL import Image
+
+from common import DEFAULT_MODEL, best_of
+
+from background_remover import BackgroundRemover
+
+# 宽图、高图和方图
+SIZES = [(4000, 1000), (6000, 2000), (1000, 4000), (2000, 6000), (4000, 3000), (3000, 3000)]
+
+
+def legacy_postprocess(pred: np.ndarray, original_size: tuple) -> Image.Image:
+    """旧实现"""
+    pred = pred.squeeze()
+    mask = Image.fromarray((pred * 255).astype(np.uint8))
+    return mask.resize(original_size, Image.LANCZOS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='mask后处理性能基准')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='ONNX模型路径')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最好成绩）')
+    args = parser.parse_args()
+
+    lanczos = BackgroundRemover(args.model)
+    bilinear = BackgroundRemover(args.model, fast_upsample=True)
+    rng = np.random.default_rng(0)
+    pred = rng.random((1, 1, lanczos.input_size, lanczos.input_size), dtype=np.float32)
+
+    print(f"{'尺寸':>12} {'方式':>14} {'耗时 ms':>9} {'较上一行节省':>12}")
+    for size in SIZES:
+        legacy = best_of(lambda: legacy_postprocess(pred, size), args.repeat)
+        cropped = best_of(lambda: lanczos._postprocess(pred, size), args.repeat)
+        fast = best_of(lambda: bilinear._postprocess(pred, size), args.repeat)
+        label = f"{size[0]}x{size[1]}"
+        print(f"{label:>12} {'旧(LANCZOS)':>14} {legacy * 1000:>9.1f} {'':>12}")
+        print(f"{'':>12} {'裁剪+LANCZOS':>14} {cropped * 1000:>9.1f} {(1 - cropped / legacy) * 100:>11.0f}%")
+        print(f"{'':>12} {'裁剪+双线性':>14} {fast * 1000:>9.1f} {(1 - fast / cropped) * 100:>11.0f}%")
+
+
+if __name__ == '__main__':
+    main()
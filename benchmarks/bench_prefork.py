@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+预分叉多进程服务基准
+
+用 prefork_server.py 分别以 1..CPU核数 个worker启动服务，并发发送去背景请求，
+输出每种worker数下的总吞吐（张/秒）、延迟中位数，以及每个worker的内存：
+RSS（含与其他进程共享的页）、USS（私有页，即每多一个worker增加的内存）和所有进程的PSS总和
+（共享页按进程数平摊，即服务实际占用的内存）。默认同时运行共享主进程模型（shared）
+和各worker分别加载模型（per-worker）两种方式以便对比。需要Linux（/proc/<pid>/smaps_rollup）。
+
+用法:
+    python benchmarks/bench_prefork.py [--workers 1 2 4] [--threads-per-worker 1] [--requests 64]
+                                       [--modes shared per-worker] [--output prefork.json]
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT_DIR, size_for_megapixels, synthetic_image
+
+MULTIPART_BOUNDARY = "bench-prefork-boundary"
+
+
+def multipart_body(data: bytes) -> bytes:
+    return (
+        f"--{MULTIPART_BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="image.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + data + f"\r\n--{MULTIPART_BOUNDARY}--\r\n".encode()
+
+
+def post_image(port: int, body: bytes) -> float:
+    """发送一个去背景请求（每次新建连接，由内核在worker之间分配），返回延迟秒数"""
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    try:
+        connection.request("POST", "/api/remove-background", body, {
+            "Content-Type": f"multipart/form-data; boundary={MULTIPART_BOUNDARY}",
+            "Accept": "image/png",
+        })
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f"请求失败: HTTP {response.status}")
+    finally:
+        connection.close()
+    return time.perf_counter() - start
+
+
+def wait_ready(port: int, process: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务启动失败（退出码 {process.returncode}）")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/status", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("等待服务启动超时")
+
+
+def child_pids(pid: int) -> list:
+    """pid 的直接子进程"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # 进程名可能含空格，ppid 取最后一个右括号之后的第2个字段
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def memory_usage(pid: int) -> dict:
+    """进程的 RSS、PSS 和 USS（私有页）字节数"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def run_server(args, mode: str, workers: int, bodies: list) -> dict:
+    command = [sys.executable, "prefork_server.py", "--workers", str(workers),
+               "--threads-per-worker", str(args.threads_per_worker),
+               "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"]
+    if mode == "per-worker":
+        command.append("--load-in-workers")
+    # 关闭结果缓存，保证每个请求都真正推理
+    env = dict(os.environ, RESULT_CACHE_MB="0", MODEL_NAME=args.model)
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_ready(args.port, process)
+        concurrency = args.concurrency or workers * 2
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # 预热：各worker都处理过请求（分别加载模型的worker也已加载完成）
+            list(executor.map(lambda body: post_image(args.port, body), bodies[:workers * 4]))
+            start = time.perf_counter()
+            latencies = list(executor.map(lambda body: post_image(args.port, body), bodies))
+            elapsed = time.perf_counter() - start
+
+        parent = memory_usage(process.pid)
+        children = [memory_usage(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    return {
+        "images_per_second": len(bodies) / elapsed,
+        "latency_ms": statistics.median(latencies) * 1000,
+        "worker_rss_mb": statistics.mean(c["rss"] for c in children) / 1024 / 1024,
+        "worker_uss_mb": statistics.mean(c["uss"] for c in children) / 1024 / 1024,
+        "total_pss_mb": (parent["pss"] + sum(c["pss"] for c in children)) / 1024 / 1024,
+    }
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({min(2 ** i, cpu_count) for i in range(cpu_count.bit_length() + 1)})
+    parser = argparse.ArgumentParser(description='预分叉多进程服务基准')
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers, help='worker数')
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='每个worker的推理线程数')
+    parser.add_argument('--modes', nargs='+', default=['shared', 'per-worker'], choices=['shared', 'per-worker'],
+                        help='shared 共享主进程加载的模型，per-worker 各worker分别加载')
+    parser.add_argument('--requests', type=int, default=64, help='每轮测量的请求数')
+    parser.add_argument('--concurrency', type=int, default=0, help='并发客户端数（默认为worker数的2倍）')
+    parser.add_argument('--megapixels', type=float, default=1, help='请求图片大小（百万像素）')
+    parser.add_argument('--model', type=str, default='u2netp', help='模型名')
+    parser.add_argument('--port', type=int, default=18000, help='测试服务端口')
+    parser.add_argument('--output', type=str, default=None, help='把结果另存为JSON文件')
+    args = parser.parse_args()
+
+    # 每个请求使用不同的图片，避免命中任何缓存
+    size = size_for_megapixels(args.megapixels)
+    bodies = []
+    for i in range(args.requests):
+        buffer = io.BytesIO()
+        synthetic_image(size, seed=i).save(buffer, 'JPEG', quality=90)
+        bodies.append(multipart_body(buffer.getvalue()))
+
+    results = []
+    print(f"{'方式':>10} {'worker':>7} {'张/秒':>8} {'延迟 ms':>9} {'每worker RSS MB':>16} "
+          f"{'每worker USS MB':>16} {'总PSS MB':>9}")
+    for mode in args.modes:
+        for workers in args.workers:
+            result = run_server(args, mode, workers, bodies)
+            results.append({"mode": mode, "workers": workers, **result})
+            print(f"{mode:>10} {workers:>7} {result['images_per_second']:>8.2f} {result['latency_ms']:>9.1f} "
+                  f"{result['worker_rss_mb']:>16.1f} {result['worker_uss_mb']:>16.1f} {result['total_pss_mb']:>9.1f}")
+
+    if args.output:
+        report = {"cpu_count": cpu_count, "threads_per_worker": args.threads_per_worker,
+                  "model": args.model, "results": results}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+预处理性能基准
+
+对比旧的 _preprocess（RGB转换 + LANCZOS + 粘贴新画布 + float64临时数组）与当前实现的
+每张耗时和numpy峰值内存分配（tracemalloc统计，Pillow内部分配不计入）。
+
+用法:
+    python benchmarks/bench_preprocess.py [--sizes 1 4 12]
+"""
+
+import argparse
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from common import DEFAULT_MODEL, best_of, size_for_megapixels, synthetic_image
+
+from background_remover import BackgroundRemover
+
+
+def legacy_preprocess(image: Image.Image, input_size: int = 320) -> np.ndarray:
+    """旧实现"""
+    image = image.convert('RGB')
+    scale = input_size / max(image.size)
+    new_size = tuple([int(x * scale) for x in image.size])
+    image = image.resize(new_size, Image.LANCZOS)
+    new_image = Image.new("RGB", (input_size, input_size), (0, 0, 0))
+    new_image.paste(image, ((input_size - new_size[0]) // 2, (input_size - new_size[1]) // 2))
+    image = np.array(new_image)
+    image = image.transpose((2, 0, 1))
+    image = image / 255.0
+    image = image.astype(np.float32)
+    return np.expand_dims(image, 0)
+
+
+def peak_allocation(func) -> int:
+    """单次调用期间numpy的峰值内存分配（字节）"""
+    func()  # 预热（新实现首次调用会分配缓冲区）
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预处理性能基准')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='ONNX模型路径')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[0.3, 1, 4, 12], help='图像大小（百万像素）')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最好成绩）')
+    args = parser.parse_args()
+
+    remover = BackgroundRemover(args.model)
+
+    print(f"{'MP':>6} {'旧 ms':>8} {'新 ms':>8} {'旧 峰值KB':>10} {'新 峰值KB':>10}")
+    for mp in args.sizes:
+        image = synthetic_image(size_for_megapixels(mp))
+        legacy_time = best_of(lambda: legacy_preprocess(image), args.repeat)
+        new_time = best_of(lambda: remover._preprocess(image), args.repeat)
+        legacy_peak = peak_allocation(lambda: legacy_preprocess(image))
+        new_peak = peak_allocation(lambda: remover._preprocess(image))
+        print(f"{mp:>6g} {legacy_time * 1000:>8.1f} {new_time * 1000:>8.1f} "
+              f"{legacy_peak / 1024:>10.0f} {new_peak / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
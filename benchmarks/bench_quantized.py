@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+INT8量化模型对比基准
+
+对比float32模型和 quantize_model.py 生成的INT8模型的加载内存、单张推理延迟，
+以及mask与float32结果的差异（阈值0.5的IoU和平均绝对误差MAE）。
+默认使用合成图片，也可以用 --images 指定样例图片目录。
+
+用法:
+    python quantize_model.py models/u2netp.onnx
+    python benchmarks/bench_quantized.py [--model models/u2netp.onnx] [--images 样例目录]
+"""
+
+import argparse
+import gc
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from common import DEFAULT_MODEL, rss_bytes, synthetic_image
+
+from background_remover import BackgroundRemover, quantized_model_path
+
+# 合成图片的尺寸（含宽图和高图）
+SIZES = [(640, 480), (1024, 768), (1920, 1080), (1080, 1920), (800, 800)]
+
+
+def load_images(image_dir: str, count: int):
+    if image_dir:
+        files = sorted(f for f in Path(image_dir).iterdir()
+                       if f.suffix.lower() in {'.png', '.jpg', '.jpeg', '.bmp', '.webp'})
+        return [Image.open(f).convert('RGB') for f in files[:count]]
+    return [synthetic_image(SIZES[i % len(SIZES)], seed=i) for i in range(count)]
+
+
+def measure(model_path: str, images, repeat: int):
+    """返回（加载增加的内存字节数, 每张平均延迟ms, mask列表）"""
+    gc.collect()
+    before = rss_bytes()
+    remover = BackgroundRemover(model_path, cache_optimized=False)
+    remover.remove_background(images[0])  # 预热，内存arena在首次推理时分配
+    memory = rss_bytes() - before
+
+    masks = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        masks = []
+        for image in images:
+            pred = remover._predict(remover._preprocess(image))
+            masks.append(np.asarray(remover._postprocess(pred, image.size), dtype=np.float32) / 255)
+    latency = (time.perf_counter() - start) / (repeat * len(images)) * 1000
+    return memory, latency, masks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='INT8量化模型对比基准')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='float32模型路径')
+    parser.add_argument('--quantized', type=str, help='INT8模型路径（默认为 <模型名>_int8.onnx）')
+    parser.add_argument('--images', type=str, help='样例图片目录（默认使用合成图片）')
+    parser.add_argument('--count', type=int, default=10, help='图片数量')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数')
+    args = parser.parse_args()
+
+    quantized = args.quantized or str(quantized_model_path(args.model))
+    if not Path(quantized).exists():
+        print(f"错误: 量化模型 '{quantized}' 不存在，请先运行 quantize_model.py")
+        return
+
+    images = load_images(args.images, args.count)
+    fp32_memory, fp32_latency, fp32_masks = measure(args.model, images, args.repeat)
+    int8_memory, int8_latency, int8_masks = measure(quantized, images, args.repeat)
+
+    ious, maes = [], []
+    for reference, mask in zip(fp32_masks, int8_masks):
+        a, b = reference >= 0.5, mask >= 0.5
+        union = np.logical_or(a, b).sum()
+        ious.append(np.logical_and(a, b).sum() / union if union else 1.0)
+        maes.append(np.abs(reference - mask).mean())
+
+    print(f"{'模型':>6} {'文件MB':>8} {'内存MB':>8} {'延迟 ms':>8}")
+    for name, path, memory, latency in [("fp32", args.model, fp32_memory, fp32_latency),
+                                        ("int8", quantized, int8_memory, int8_latency)]:
+        print(f"{name:>6} {Path(path).stat().st_size / 2**20:>8.1f} {memory / 2**20:>8.1f} {latency:>8.1f}")
+    print(f"\nINT8相对float32: 加速 {fp32_latency / int8_latency:.2f}x，"
+          f"mask IoU 平均 {np.mean(ious):.4f} / 最低 {np.min(ious):.4f}，"
+          f"MAE 平均 {np.mean(maes):.4f} / 最高 {np.max(maes):.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+ONNX运行时会话配置基准
+
+对每种线程数/图优化级别/执行模式组合，测量冷启动（无优化图缓存）和热启动（命中缓存）
+的会话创建时间，以及单张推理吞吐。模型会复制到临时目录，不会在 models/ 下留下缓存文件。
+
+用法:
+    python benchmarks/bench_session.py [--threads 1 2 4] [--levels basic extended all]
+"""
+
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+import time
+
+from common import DEFAULT_MODEL, synthetic_image
+
+from background_remover import BackgroundRemover, optimized_model_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ONNX运行时会话配置基准')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='ONNX模型路径')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 0], help='intra-op线程数（0为默认）')
+    parser.add_argument('--levels', nargs='+', default=['disable', 'basic', 'extended', 'all'], help='图优化级别')
+    parser.add_argument('--modes', nargs='+', default=['sequential', 'parallel'], help='执行模式')
+    parser.add_argument('--runs', type=int, default=20, help='吞吐测试的推理次数')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    model_path = os.path.join(tmp_dir, os.path.basename(args.model))
+    shutil.copy(args.model, model_path)
+
+    print(f"{'线程':>4} {'优化级别':>9} {'执行模式':>11} {'冷启动 ms':>10} {'热启动 ms':>10} {'张/秒':>8}")
+    try:
+        for threads, level, mode in itertools.product(args.threads, args.levels, args.modes):
+            options = dict(intra_op_threads=threads, graph_optimization_level=level,
+                           execution_mode=mode, cache_optimized=True)
+            cache_path = optimized_model_path(model_path, level)
+            if cache_path.exists():
+                cache_path.unlink()
+
+            start = time.perf_counter()
+            BackgroundRemover(model_path, **options)
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            remover = BackgroundRemover(model_path, **options)
+            warm = time.perf_counter() - start
+
+            batch = remover._preprocess(synthetic_image((1024, 768))).copy()
+            remover._predict(batch)
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                remover._predict(batch)
+            throughput = args.runs / (time.perf_counter() - start)
+
+            print(f"{threads or '默认':>4} {level:>9} {mode:>11} {cold * 1000:>10.1f} "
+                  f"{warm * 1000:>10.1f} {throughput:>8.1f}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
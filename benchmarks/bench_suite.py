@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+BackgroundRemover 综合基准
+
+在多种分辨率和宽高比的合成JPEG上，分别测量各处理阶段（解码、预处理、推理、后处理、
+全分辨率解码+合成、PNG编码）的耗时，以及 1..N 个线程并发调用 remove_background_file
+的端到端吞吐和延迟，并记录峰值内存。结果以JSON输出，便于在不同提交或机器之间对比。
+
+用法:
+    python benchmarks/bench_suite.py [--sizes 0.3 1 4 12] [--aspects 4:3 16:9 9:16 1:1]
+                                     [--threads 1 2 4] [--output result.json]
+    python benchmarks/bench_suite.py --compare baseline.json result.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import DEFAULT_MODEL, ROOT_DIR, peak_rss_bytes, rss_bytes, size_for_megapixels, synthetic_image
+
+import numpy as np
+import onnxruntime as ort
+from PIL import Image
+
+from background_remover import BackgroundRemover
+from image_io import encode_image, open_for_inference, open_full
+
+
+def parse_aspect(value: str) -> float:
+    width, _, height = value.partition(":")
+    return float(width) / float(height or 1)
+
+
+def median_ms(func, repeat: int) -> float:
+    """多次运行取中位数耗时（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def percentile(values: list, q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def environment(args) -> dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "onnxruntime": ort.__version__,
+        "pillow": Image.__version__,
+        "model": os.path.basename(args.model),
+        "intra_op_threads": args.intra_op_threads,
+    }
+
+
+def encode_jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def bench_stages(remover: BackgroundRemover, data: bytes, repeat: int) -> dict:
+    """逐阶段测量一张图片的耗时（毫秒，中位数）"""
+    min_size = int(remover.input_size * remover.reducing_gap)
+
+    def decode():
+        image = open_for_inference(data, min_size)[0]
+        image.load()
+        return image
+
+    image = decode()
+    original_size = open_full(data).size
+    batch = remover._preprocess(image).copy()
+    pred = remover._predict(batch)
+    mask = remover._postprocess(pred, original_size)
+    full_image = open_full(data)
+    full_image.load()
+    output = remover.apply_mask(full_image, mask)
+
+    stages = {
+        "decode": median_ms(decode, repeat),
+        "preprocess": median_ms(lambda: remover._preprocess(image), repeat),
+        "inference": median_ms(lambda: remover._predict(batch), repeat),
+        "postprocess": median_ms(lambda: remover._postprocess(pred, original_size), repeat),
+        "decode_full": median_ms(lambda: open_full(data).load(), repeat),
+        "composite": median_ms(lambda: remover.apply_mask(full_image, mask), repeat),
+        "encode": median_ms(lambda: encode_image(output), repeat),
+    }
+    stages["end_to_end"] = median_ms(lambda: encode_image(remover.remove_background_file(data)), repeat)
+    return stages
+
+
+def bench_throughput(remover: BackgroundRemover, images: list, threads: int, rounds: int) -> dict:
+    """threads 个线程并发处理 images（重复 rounds 轮），返回吞吐和延迟分布"""
+    def task(data: bytes) -> float:
+        start = time.perf_counter()
+        encode_image(remover.remove_background_file(data))
+        return time.perf_counter() - start
+
+    work = images * rounds
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(task, images[:threads]))  # 预热各线程的输入缓冲区
+        start = time.perf_counter()
+        latencies = list(executor.map(task, work))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "threads": threads,
+        "images": len(work),
+        "images_per_sec": len(work) / elapsed,
+        "latency_ms_p50": percentile(latencies_ms, 50),
+        "latency_ms_p95": percentile(latencies_ms, 95),
+        "latency_ms_max": max(latencies_ms),
+        "rss_mb": rss_bytes() / 1024 / 1024,
+        "peak_rss_mb": peak_rss_bytes() / 1024 / 1024,
+    }
+
+
+def run(args) -> dict:
+    baseline_rss = rss_bytes()
+    start = time.perf_counter()
+    remover = BackgroundRemover(args.model, intra_op_threads=args.intra_op_threads)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    cases = []
+    for mp in args.sizes:
+        for aspect in args.aspects:
+            size = size_for_megapixels(mp, parse_aspect(aspect))
+            data = encode_jpeg(synthetic_image(size, seed=len(cases)))
+            cases.append({"megapixels": mp, "aspect": aspect, "width": size[0], "height": size[1], "data": data})
+
+    stages = []
+    for case in cases:
+        result = {key: value for key, value in case.items() if key != "data"}
+        result["jpeg_bytes"] = len(case["data"])
+        result["stages_ms"] = bench_stages(remover, case["data"], args.repeat)
+        stages.append(result)
+        print(f"{case['megapixels']:>5}MP {case['aspect']:>5} {case['width']}x{case['height']}: "
+              + " ".join(f"{name}={ms:.1f}" for name, ms in result["stages_ms"].items()), file=sys.stderr)
+
+    throughput = []
+    images = [case["data"] for case in cases]
+    for threads in args.threads:
+        result = bench_throughput(remover, images, threads, args.rounds)
+        throughput.append(result)
+        print(f"{threads:>2} 线程: {result['images_per_sec']:.2f} 张/秒 "
+              f"p50={result['latency_ms_p50']:.1f}ms p95={result['latency_ms_p95']:.1f}ms "
+              f"峰值RSS={result['peak_rss_mb']:.0f}MB", file=sys.stderr)
+
+    return {
+        "environment": environment(args),
+        "model_load_ms": load_ms,
+        "baseline_rss_mb": baseline_rss / 1024 / 1024,
+        "stages": stages,
+        "throughput": throughput,
+        "peak_rss_mb": peak_rss_bytes() / 1024 / 1024,
+    }
+
+
+def compare(baseline_path: str, current_path: str) -> None:
+    """对比两次运行的结果（current / baseline，耗时 < 1 或吞吐 > 1 表示变快）"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)
+    print(f"基准: {baseline['environment']['commit']}  当前: {current['environment']['commit']}")
+
+    baseline_stages = {(s["megapixels"], s["aspect"]): s["stages_ms"] for s in baseline["stages"]}
+    for result in current["stages"]:
+        before = baseline_stages.get((result["megapixels"], result["aspect"]))
+        if before is None:
+            continue
+        ratios = " ".join(
+            f"{name}={ms / before[name]:.2f}x" for name, ms in result["stages_ms"].items()
+            if before.get(name)
+        )
+        print(f"{result['megapixels']:>5}MP {result['aspect']:>5} 耗时比: {ratios}")
+
+    baseline_throughput = {t["threads"]: t for t in baseline["throughput"]}
+    for result in current["throughput"]:
+        before = baseline_throughput.get(result["threads"])
+        if before is None:
+            continue
+        print(f"{result['threads']:>2} 线程 吞吐比: {result['images_per_sec'] / before['images_per_sec']:.2f}x "
+              f"p95耗时比: {result['latency_ms_p95'] / before['latency_ms_p95']:.2f}x")
+    print(f"峰值RSS: {baseline['peak_rss_mb']:.0f}MB -> {current['peak_rss_mb']:.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BackgroundRemover 综合基准')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help='ONNX模型路径')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[0.3, 1, 4, 12], help='图像大小（百万像素）')
+    parser.add_argument('--aspects', nargs='+', default=['4:3', '16:9', '9:16', '1:1'], help='宽高比')
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help='并发线程数')
+    parser.add_argument('--intra-op-threads', type=int, default=None, help='ONNX运行时intra-op线程数')
+    parser.add_argument('--repeat', type=int, default=5, help='阶段耗时的重复次数（取中位数）')
+    parser.add_argument('--rounds', type=int, default=2, help='吞吐测试中每张图片的处理轮数')
+    parser.add_argument('--output', type=str, default=None, help='JSON结果文件（默认输出到标准输出）')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='对比两个JSON结果文件')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+基准脚本共用的工具函数
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+# 让基准脚本可以直接导入仓库根目录下的模块
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+DEFAULT_MODEL = os.path.join(ROOT_DIR, "models", "u2netp.onnx")
+
+
+def size_for_megapixels(megapixels: float, aspect: float = 4 / 3) -> tuple:
+    """按像素数和宽高比计算图像尺寸"""
+    width = int((megapixels * 1e6 * aspect) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    return width, height
+
+
+def synthetic_image(size: tuple, seed: int = 0) -> Image.Image:
+    """生成带前景形状的合成RGB图像（比纯噪声更接近真实照片的压缩和推理特征）"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    # 渐变背景
+    background = np.stack([
+        xx / max(width - 1, 1) * 255,
+        yy / max(height - 1, 1) * 255,
+        np.full_like(xx, 128),
+    ], axis=-1)
+    # 椭圆前景
+    cx, cy = width * rng.uniform(0.4, 0.6), height * rng.uniform(0.4, 0.6)
+    inside = ((xx - cx) / (width * 0.3)) ** 2 + ((yy - cy) / (height * 0.35)) ** 2 <= 1
+    foreground = np.array(rng.integers(0, 256, 3), dtype=np.float32)
+    image = np.where(inside[..., None], foreground, background)
+    image += rng.normal(0, 8, image.shape)
+    return Image.fromarray(np.clip(image, 0, 255).astype(np.uint8), 'RGB')
+
+
+def random_mask(size: tuple, seed: int = 0) -> Image.Image:
+    """生成随机灰度mask"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (height, width), dtype=np.uint8), 'L')
+
+
+def best_of(func, repeat: int = 3) -> float:
+    """多次运行取最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_rss_bytes() -> int:
+    """进程启动以来的峰值常驻内存（字节）"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def rss_bytes() -> int:
+    """当前进程的常驻内存（字节），非Linux平台退化为峰值RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
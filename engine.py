@@ -0,0 +1,148 @@
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from image_io import DRAFT_MIN_SIZE, ImageSource, open_for_inference, open_full
+from metrics import stage
+
+# 可选推理后端：onnx 直接运行ONNX模型（BackgroundRemover），rembg 使用 rembg 的会话
+ENGINE_BACKENDS = ["onnx", "rembg"]
+# 环境变量指定的后端；为空时各入口使用自己的默认值（API服务为onnx，其余为rembg）
+ENGINE_BACKEND = os.getenv("ENGINE_BACKEND", "")
+
+
+class Engine:
+    """去背景引擎接口
+
+    后端只需实现 predict_mask（必要时覆盖 predict_masks 做批量推理）；缩小解码、mask放大、
+    边缘细化和合成由本类统一完成，不同后端的前后处理和输出格式完全一致。
+    """
+
+    # 后端名称
+    backend = ""
+    # 是否默认细化mask边缘（可按调用覆盖）
+    refine_edges = False
+    # 推理用缩小解码的最小长边
+    decode_min_size = DRAFT_MIN_SIZE
+
+    def predict_mask(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """在 image 上预测前景mask，返回尺寸为 size 的灰度mask"""
+        raise NotImplementedError
+
+    def predict_masks(
+        self, images: List[Image.Image], sizes: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> List[Image.Image]:
+        """批量预测mask（默认逐张预测，支持批量推理的后端应覆盖）；sizes 默认为各图片自身尺寸"""
+        sizes = sizes or [image.size for image in images]
+        return [self.predict_mask(image, size) for image, size in zip(images, sizes)]
+
+    def decode(self, source: ImageSource) -> Tuple[Image.Image, Tuple[int, int], bool]:
+        """缩小解码用于推理的图片，返回（图片, 原图尺寸, 是否为全分辨率解码）"""
+        with stage("decode"):
+            image, original_size, is_full = open_for_inference(source, self.decode_min_size)
+            image.load()
+        return image, original_size, is_full
+
+    def refine(self, image: Image.Image, mask: Image.Image, refine: Optional[bool] = None) -> Image.Image:
+        """按需以原图为引导细化mask边缘"""
+        if refine is None:
+            refine = self.refine_edges
+        if not refine:
+            return mask
+        # 细化依赖numpy，用到时才导入，不拖慢服务的冷启动
+        from mask_refine import refine_mask
+
+        with stage("refine"):
+            return refine_mask(image, mask)
+
+    def compose(
+        self, source: ImageSource, image: Image.Image, is_full: bool, mask: Image.Image,
+        refine: Optional[bool] = None, mask_only: bool = False
+    ) -> Image.Image:
+        """把原图尺寸的mask应用到全分辨率图片上（image、is_full 为 decode 的返回值）
+
+        mask_only=True 且不细化时完全跳过全分辨率解码，直接返回mask。
+        """
+        if refine is None:
+            refine = self.refine_edges
+        if mask_only and not refine:
+            return mask
+
+        if is_full:
+            full_image = image
+        else:
+            with stage("decode_full"):
+                full_image = open_full(source)
+                full_image.load()
+        mask = self.refine(full_image, mask, refine)
+        return mask if mask_only else self.apply_mask(full_image, mask)
+
+    def remove_background(self, input_image: Image.Image, refine: Optional[bool] = None) -> Image.Image:
+        """移除图像背景"""
+        return self.remove_background_batch([input_image], refine)[0]
+
+    def remove_background_batch(
+        self, input_images: List[Image.Image], refine: Optional[bool] = None
+    ) -> List[Image.Image]:
+        """批量移除图像背景"""
+        masks = self.predict_masks(input_images)
+        return [
+            self.apply_mask(image, self.refine(image, mask, refine))
+            for image, mask in zip(input_images, masks)
+        ]
+
+    def remove_background_file(
+        self, source: ImageSource, refine: Optional[bool] = None, mask_only: bool = False
+    ) -> Image.Image:
+        """从字节、路径或文件对象移除背景
+
+        推理输入来自缩小解码（JPEG DCT缩放），全分辨率解码只在合成（或边缘细化）时进行；
+        mask_only=True 且不细化时完全跳过全分辨率解码，直接返回原图尺寸的mask。
+        """
+        image, original_size, is_full = self.decode(source)
+        mask = self.predict_mask(image, original_size)
+        return self.compose(source, image, is_full, mask, refine, mask_only)
+
+    @staticmethod
+    def apply_mask(image: Image.Image, mask: Image.Image) -> Image.Image:
+        """将mask作为alpha通道合成到图像上（使用Pillow原生波段操作，避免逐像素循环）"""
+        with stage("composite"):
+            output_image = image.convert('RGB')
+            output_image.putalpha(mask)
+            return output_image
+
+    def close(self) -> None:
+        """释放后端持有的资源"""
+
+
+def create_engine(
+    backend: str = "onnx",
+    model: str = "u2netp",
+    models_dir: Optional[str] = None,
+    max_batch_size: int = 1,
+    **options,
+) -> Engine:
+    """按后端名称创建引擎（后端依赖在这里才导入，未使用的后端不需要安装）
+
+    onnx: 从 models_dir 加载 <model>.onnx，max_batch_size > 1 时并发请求动态合批，
+          options 传给 BackgroundRemover（如 refine_edges、fast_upsample、intra_op_threads）；
+    rembg: 使用 rembg 的会话（模型由 rembg 下载到 U2NET_HOME），options 只支持 refine_edges。
+    """
+    if backend == "onnx":
+        from background_remover import BackgroundRemover
+
+        if models_dir is None:
+            from model_registry import MODELS_DIR
+            models_dir = MODELS_DIR
+        engine = BackgroundRemover(str(Path(models_dir) / f"{model}.onnx"), **options)
+        if max_batch_size > 1:
+            from batch_scheduler import BatchScheduler
+            return BatchScheduler(engine, max_batch_size=max_batch_size)
+        return engine
+    if backend == "rembg":
+        from rembg_engine import RembgEngine
+
+        return RembgEngine(model, **options)
+    raise ValueError(f"不支持的后端: {backend}，可选后端: {', '.join(ENGINE_BACKENDS)}")
@@ -0,0 +1,83 @@
+import numpy as np
+from PIL import Image
+
+# 分块大小，只处理包含不确定边缘带的块
+TILE_SIZE = 128
+
+
+def _box_sum(x: np.ndarray, r: int, axis: int) -> np.ndarray:
+    """沿一个轴求 2r+1 窗口内的和（前缀和相减，越界部分视为0）"""
+    n = x.shape[axis]
+    shape = list(x.shape)
+    shape[axis] = 1
+    prefix = np.concatenate([np.zeros(shape, dtype=np.float64), np.cumsum(x, axis=axis, dtype=np.float64)], axis=axis)
+    index = np.arange(n)
+    return (np.take(prefix, np.minimum(index + r + 1, n), axis=axis)
+            - np.take(prefix, np.maximum(index - r, 0), axis=axis))
+
+
+def _box_filter(x: np.ndarray, r: int) -> np.ndarray:
+    """(2r+1)x(2r+1) 窗口均值（可分离前缀和实现，边界处按实际像素数归一化）"""
+    h, w = x.shape
+    sums = _box_sum(_box_sum(x, r, 0), r, 1)
+    rows = np.minimum(np.arange(h) + r + 1, h) - np.maximum(np.arange(h) - r, 0)
+    cols = np.minimum(np.arange(w) + r + 1, w) - np.maximum(np.arange(w) - r, 0)
+    return (sums / np.outer(rows, cols)).astype(np.float32)
+
+
+def guided_filter(guide: np.ndarray, src: np.ndarray, r: int, eps: float) -> np.ndarray:
+    """灰度引导滤波（He et al.），guide和src均为[0,1]的float32二维数组"""
+    mean_i = _box_filter(guide, r)
+    mean_p = _box_filter(src, r)
+    corr_ip = _box_filter(guide * src, r)
+    var_i = _box_filter(guide * guide, r) - mean_i * mean_i
+
+    a = (corr_ip - mean_i * mean_p) / (var_i + eps)
+    b = mean_p - a * mean_i
+    return _box_filter(a, r) * guide + _box_filter(b, r)
+
+
+def uncertain_band(mask: np.ndarray, low: float, high: float) -> np.ndarray:
+    """mask中既非确定前景也非确定背景的像素"""
+    return (mask > low) & (mask < high)
+
+
+def refine_mask(
+    image: Image.Image,
+    mask: Image.Image,
+    radius: int = 8,
+    eps: float = 1e-3,
+    low: float = 0.05,
+    high: float = 0.95,
+) -> Image.Image:
+    """用原图作引导，对放大后的mask做引导滤波细化边缘
+
+    只处理包含不确定边缘带（low < alpha < high）的分块，带外像素保持不变，
+    因此耗时与边缘带面积而不是整图面积成正比。
+    """
+    alpha = np.asarray(mask, dtype=np.float32) / 255
+    band = uncertain_band(alpha, low, high)
+    if not band.any():
+        return mask
+
+    guide = np.asarray(image.convert('L'), dtype=np.float32) / 255
+    refined = alpha.copy()
+    height, width = alpha.shape
+    # 两次盒式滤波，分块需要向外扩展2r才能得到与整图一致的结果
+    pad = 2 * radius
+
+    for ty in range(0, height, TILE_SIZE):
+        for tx in range(0, width, TILE_SIZE):
+            tile_band = band[ty:ty + TILE_SIZE, tx:tx + TILE_SIZE]
+            if not tile_band.any():
+                continue
+
+            y0, y1 = max(ty - pad, 0), min(ty + TILE_SIZE + pad, height)
+            x0, x1 = max(tx - pad, 0), min(tx + TILE_SIZE + pad, width)
+            filtered = guided_filter(guide[y0:y1, x0:x1], alpha[y0:y1, x0:x1], radius, eps)
+            filtered = filtered[ty - y0:ty - y0 + tile_band.shape[0], tx - x0:tx - x0 + tile_band.shape[1]]
+
+            target = refined[ty:ty + TILE_SIZE, tx:tx + TILE_SIZE]
+            target[tile_band] = filtered[tile_band]
+
+    return Image.fromarray((np.clip(refined, 0, 1) * 255 + 0.5).astype(np.uint8), 'L')
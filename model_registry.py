@@ -0,0 +1,129 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 可选模型
+AVAILABLE_MODELS = ["u2net", "u2netp", "u2net_human_seg"]
+# INT8量化模型（由 quantize_model.py 生成，只有直接使用ONNX的 BackgroundRemover 支持）
+QUANTIZED_MODELS = [f"{name}_int8" for name in AVAILABLE_MODELS]
+# 默认模型目录和模型
+MODELS_DIR = os.getenv("MODELS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+DEFAULT_MODEL = os.getenv("MODEL_NAME", "u2netp")
+# 常驻内存的模型总大小上限（默认256MB，足够同时放下u2net和u2netp）
+MODEL_CACHE_BYTES = int(os.getenv("MODEL_CACHE_MB", "256")) * 1024 * 1024
+
+
+class ModelRegistry:
+    """按名称懒加载模型，在字节预算内按LRU淘汰不常用的模型
+
+    loader(name) 负责加载模型，sizer(name) 返回模型占用的字节数（默认为模型文件大小，
+    权重是会话内存的主要部分）。同一模型并发请求时只加载一次。
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        max_bytes: int = MODEL_CACHE_BYTES,
+        models_dir: str = MODELS_DIR,
+        available: Optional[List[str]] = None,
+        sizer: Optional[Callable[[str], int]] = None,
+    ):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.models_dir = Path(models_dir)
+        self.available = list(available or AVAILABLE_MODELS)
+        self.sizer = sizer or self._file_size
+
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def model_path(self, name: str) -> str:
+        """模型文件路径"""
+        return str(self.models_dir / f"{name}.onnx")
+
+    def _file_size(self, name: str) -> int:
+        try:
+            return os.path.getsize(self.model_path(name))
+        except OSError:
+            return 0
+
+    def get(self, name: Optional[str] = None) -> Any:
+        """获取模型，未加载时加载并按需淘汰最久未用的模型"""
+        name = name or DEFAULT_MODEL
+        if name not in self.available:
+            raise KeyError(f"不支持的模型：{name}")
+
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                self.hits += 1
+                return self._models[name]
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        # 加载在全局锁外进行，不阻塞其他模型的读取
+        with loading:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    self.hits += 1
+                    return self._models[name]
+                self.misses += 1
+
+            model = self.loader(name)
+            size = self.sizer(name)
+
+            with self._lock:
+                self._models[name] = model
+                self._sizes[name] = size
+                self._evict(keep=name)
+                self._loading.pop(name, None)
+            return model
+
+    def _evict(self, keep: str) -> None:
+        """淘汰最久未用的模型直到总大小不超过预算（刚加载的模型始终保留）"""
+        while sum(self._sizes.values()) > self.max_bytes and len(self._models) > 1:
+            name = next(iter(self._models))
+            if name == keep:
+                self._models.move_to_end(name)
+                continue
+            model = self._models.pop(name)
+            del self._sizes[name]
+            self.evictions += 1
+            # 释放模型持有的后台资源（如合批调度线程）
+            if hasattr(model, "close"):
+                model.close()
+
+    def preload(self, names: List[str]) -> None:
+        """预加载模型"""
+        for name in names:
+            self.get(name)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """当前常驻内存的（模型名, 模型）"""
+        with self._lock:
+            return list(self._models.items())
+
+    def loaded(self) -> List[str]:
+        """当前常驻内存的模型（从最久未用到最近使用）"""
+        with self._lock:
+            return list(self._models)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            return {
+                "loaded_models": list(self._models),
+                "loaded_bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+预分叉（pre-fork）多进程API服务
+
+主进程导入 api_server 并加载默认模型后监听端口，再 fork 出多个worker共享同一个监听socket。
+worker 通过写时复制（copy-on-write）共享主进程中的模型权重、ONNX运行时会话和已导入的模块，
+不像 uvicorn --workers 那样每个进程各自导入并加载一份模型。
+
+ONNX运行时的算子内线程池在 fork 后不可用，所以只有每个worker 1个推理线程（默认）、
+onnx 后端且未开启合批时才共享主进程的会话；否则主进程只预先导入依赖，
+各worker在 fork 后按自己的线程数分别加载模型。
+
+用法:
+    python prefork_server.py [--workers 4] [--threads-per-worker 1] [--port 8000] [--cpu-affinity]
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Optional
+
+# 就绪（模型已加载）前退出或就绪后很快退出的worker视为启动失败（如模型文件缺失），不再重启
+STARTUP_GRACE_SECONDS = 5.0
+
+
+def read_rss_bytes(pid: int) -> int:
+    """进程的常驻内存（字节），无法读取时返回0"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def shares_parent_model(backend: str, threads_per_worker: int, batch_max_size: int) -> bool:
+    """能否在主进程加载模型后直接 fork：会话不能有线程池线程，也不能有合批调度线程"""
+    return backend == "onnx" and threads_per_worker == 1 and batch_max_size <= 1
+
+
+def create_listener(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_cpus(index: int, threads_per_worker: int) -> set:
+    """第 index 个worker绑定的CPU：按线程数依次分配，超出核数时回绕"""
+    cpu_count = os.cpu_count() or 1
+    return {(index * threads_per_worker + i) % cpu_count for i in range(threads_per_worker)}
+
+
+def run_worker(index: int, sock: socket.socket, args, shared: bool, ready_fd: int) -> int:
+    """worker进程：按需加载模型后在共享socket上运行uvicorn，返回退出码
+
+    模型加载完成后向 ready_fd 写入就绪时刻（time.monotonic()，各进程共用同一时钟）通知主进程。
+    """
+    import uvicorn
+    import api_server
+
+    # 恢复默认信号处理，由uvicorn接管
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if args.cpu_affinity and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, worker_cpus(index, args.threads_per_worker))
+
+    if not shared:
+        api_server.warmup()
+        if api_server.warmup_state["error"]:
+            print(f"worker {index} 加载模型失败: {api_server.warmup_state['error']}", file=sys.stderr)
+            return 1
+
+    os.write(ready_fd, repr(time.monotonic()).encode())
+    os.close(ready_fd)
+
+    config = uvicorn.Config(api_server.app, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预分叉多进程API服务（worker共享主进程加载的模型）')
+    parser.add_argument('--host', type=str, default=os.getenv("HOST", "0.0.0.0"), help='监听地址')
+    parser.add_argument('--port', type=int, default=int(os.getenv("PORT", "8000")), help='监听端口')
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1, help='worker进程数（默认为CPU核数）')
+    parser.add_argument('--threads-per-worker', '-t', type=int, default=1,
+                        help='每个worker的推理线程数（ONNX运行时算子内线程数，默认为1；大于1时各worker分别加载模型）')
+    parser.add_argument('--cpu-affinity', action='store_true', help='把每个worker绑定到各自的CPU核（仅Linux）')
+    parser.add_argument('--load-in-workers', action='store_true', help='不共享主进程的模型，各worker分别加载（用于对比内存）')
+    parser.add_argument('--log-level', type=str, default='info', help='uvicorn日志级别')
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        parser.error("当前平台不支持 fork，请直接运行 python api_server.py")
+    if args.workers < 1 or args.threads_per_worker < 1:
+        parser.error("--workers 和 --threads-per-worker 至少为1")
+
+    # 固定每个worker的线程数：ONNX运行时和OpenMP按推理线程数，请求处理线程每个worker一个，
+    # 所有worker的推理线程总数为 workers * threads_per_worker
+    os.environ["ORT_INTRA_OP_THREADS"] = str(args.threads_per_worker)
+    os.environ["OMP_NUM_THREADS"] = str(args.threads_per_worker)
+    os.environ.setdefault("WORKER_THREADS", "1")
+
+    from batch_scheduler import BATCH_MAX_SIZE
+    from engine import ENGINE_BACKEND
+
+    shared = not args.load_in_workers and shares_parent_model(
+        ENGINE_BACKEND or "onnx", args.threads_per_worker, BATCH_MAX_SIZE
+    )
+    # 共享时主进程在导入 api_server 时加载默认模型；否则推迟到各worker中加载
+    os.environ["WARMUP_MODE"] = "eager" if shared else "lazy"
+    import api_server  # noqa: F401
+    import uvicorn  # noqa: F401
+    if not shared:
+        # 推理依赖仍在主进程导入，worker之间共享这部分内存
+        import background_remover  # noqa: F401
+
+    sock = create_listener(args.host, args.port)
+    # 把已有对象移出垃圾回收的跟踪范围，避免worker中的GC扫描触发写时复制
+    gc.freeze()
+
+    print(f"主进程 {os.getpid()}: {'已加载模型' if shared else '已导入依赖'}，"
+          f"常驻内存 {read_rss_bytes(os.getpid()) / 1024 / 1024:.1f} MB")
+    print(f"启动 {args.workers} 个worker，每个 {args.threads_per_worker} 个推理线程，"
+          f"{'共享主进程的模型' if shared else '各worker分别加载模型'}，监听 {args.host}:{args.port}")
+
+    children = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(ready_read)
+                for _, other_read in children.values():
+                    os.close(other_read)
+                code = run_worker(index, sock, args, shared, ready_write)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                # 不执行主进程注册的清理逻辑
+                os._exit(code)
+        os.close(ready_write)
+        children[pid] = (index, ready_read)
+
+    def ready_at(ready_read: int) -> Optional[float]:
+        """已退出worker的就绪时刻，未就绪时返回 None"""
+        try:
+            data = os.read(ready_read, 64)
+        finally:
+            os.close(ready_read)
+        return float(data) if data else None
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for index in range(args.workers):
+        spawn(index)
+
+    exit_code = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in children:
+            continue
+        index, ready_read = children.pop(pid)
+        ready = ready_at(ready_read)
+        if stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        # 宽限期从就绪时算起：加载模型耗时再长，加载失败也不会被当作运行中崩溃而反复重启
+        if ready is None or time.monotonic() - ready < STARTUP_GRACE_SECONDS:
+            reason = "加载模型完成前退出" if ready is None else "就绪后立即退出"
+            print(f"worker {index}（pid {pid}）{reason}（退出码 {code}），停止服务", file=sys.stderr)
+            exit_code = 1
+            stop(signal.SIGTERM, None)
+            continue
+        # 异常退出的worker从主进程重新 fork，共享模式下不需要重新加载模型
+        print(f"worker {index}（pid {pid}）退出（退出码 {code}），重新启动", file=sys.stderr)
+        spawn(index)
+
+    for _, ready_read in children.values():
+        os.close(ready_read)
+    sock.close()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 from rembg.session_factory import new_session
+from model_registry import AVAILABLE_MODELS
 
-def preload_models():
+def preload_models(registry=None):
+    """下载并加载所有模型；传入 ModelRegistry 时加载到注册表中常驻内存"""
     print("预加载模型...")
-    models = ["u2net", "u2netp", "u2net_human_seg"]
-    for model in models:
+    for model in AVAILABLE_MODELS:
         print(f"加载 {model} 模型")
         try:
-            new_session(model)
+            if registry is not None:
+                registry.get(model)
+            else:
+                new_session(model)
         except Exception as e:
             print(f"加载 {model} 失败: {str(e)}")
     print("模型预加载完成")
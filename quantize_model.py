@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+离线生成INT8量化模型
+
+动态量化只量化权重，不需要校准数据；静态量化同时量化激活值，需要一个图片目录做校准，
+对卷积网络通常更快。生成的模型默认保存为 models/<模型名>_int8.onnx，
+可通过 BackgroundRemover(quantized=True) 或 API 的 model=<模型名>_int8 使用。
+
+用法:
+    python quantize_model.py models/u2netp.onnx
+    python quantize_model.py models/u2netp.onnx --mode static --calibration-dir images
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from PIL import Image
+
+from background_remover import BackgroundRemover, quantized_model_path
+
+SUPPORTED_FORMATS = {'.png', '.jpg', '.jpeg', '.bmp', '.webp'}
+
+
+def check_quantization():
+    """检查量化依赖（onnxruntime.quantization 需要 onnx 库）"""
+    try:
+        from onnxruntime import quantization
+        return quantization, None
+    except ImportError as e:
+        return None, f"导入错误: {str(e)}，请运行: {sys.executable} -m pip install onnx"
+
+
+def calibration_reader(quantization, model_path: str, calibration_dir: Path, limit: int):
+    """用目录中的图片生成校准数据（与推理使用相同的预处理）"""
+    remover = BackgroundRemover(model_path, cache_optimized=False)
+    image_files = sorted(f for f in calibration_dir.iterdir() if f.suffix.lower() in SUPPORTED_FORMATS)[:limit]
+    if not image_files:
+        raise ValueError(f"在 {calibration_dir} 中没有找到校准图片")
+
+    class ImageDataReader(quantization.CalibrationDataReader):
+        def __init__(self):
+            self.files = iter(image_files)
+
+        def get_next(self):
+            path = next(self.files, None)
+            if path is None:
+                return None
+            with Image.open(path) as image:
+                # 预处理缓冲区会被复用，这里需要拷贝一份
+                return {remover.input_name: remover._preprocess(image).copy()}
+
+    print(f"使用 {len(image_files)} 张图片进行校准")
+    return ImageDataReader()
+
+
+def quantize(model_path: str, output_path: str, mode: str = "dynamic",
+             calibration_dir: str = None, calibration_limit: int = 100) -> None:
+    """量化模型并保存"""
+    quantization, error_msg = check_quantization()
+    if quantization is None:
+        raise RuntimeError(error_msg)
+
+    if mode == "dynamic":
+        quantization.quantize_dynamic(
+            model_path, output_path,
+            weight_type=quantization.QuantType.QUInt8,
+        )
+    elif mode == "static":
+        if calibration_dir is None:
+            raise ValueError("静态量化需要通过 --calibration-dir 指定校准图片目录")
+        reader = calibration_reader(quantization, model_path, Path(calibration_dir), calibration_limit)
+        quantization.quantize_static(
+            model_path, output_path, reader,
+            quant_format=quantization.QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=quantization.QuantType.QUInt8,
+            weight_type=quantization.QuantType.QInt8,
+        )
+    else:
+        raise ValueError(f"不支持的量化模式: {mode}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成INT8量化模型')
+    parser.add_argument('model', type=str, nargs='?', default='models/u2netp.onnx', help='float32模型路径')
+    parser.add_argument('--output', '-o', type=str, help='输出路径（默认为 <模型名>_int8.onnx）')
+    parser.add_argument('--mode', choices=['dynamic', 'static'], default='dynamic', help='量化模式')
+    parser.add_argument('--calibration-dir', type=str, help='静态量化的校准图片目录')
+    parser.add_argument('--calibration-limit', type=int, default=100, help='最多使用的校准图片数量')
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"错误: 模型文件 '{args.model}' 不存在")
+        return
+
+    output_path = args.output or str(quantized_model_path(args.model))
+    try:
+        quantize(args.model, output_path, args.mode, args.calibration_dir, args.calibration_limit)
+    except Exception as e:
+        print(f"量化失败: {str(e)}")
+        return
+
+    original_size = Path(args.model).stat().st_size / 1024 / 1024
+    quantized_size = Path(output_path).stat().st_size / 1024 / 1024
+    print(f"量化完成！结果已保存到: {output_path}")
+    print(f"模型大小: {original_size:.1f}MB -> {quantized_size:.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
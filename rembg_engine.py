@@ -0,0 +1,33 @@
+from typing import Tuple
+
+from PIL import Image
+
+from engine import Engine
+from metrics import stage
+
+
+class RembgEngine(Engine):
+    """使用 rembg 会话预测mask的去背景引擎（rembg 后端）
+
+    rembg 只负责预测mask，缩小解码、mask放大、边缘细化和合成与 onnx 后端相同。
+    模型由 rembg 按名称加载（首次使用时下载到 U2NET_HOME）。
+    """
+
+    backend = "rembg"
+
+    def __init__(self, model_name: str = "u2netp", session=None, refine_edges: bool = False):
+        from rembg import new_session, remove
+
+        self.model_name = model_name
+        self.session = session if session is not None else new_session(model_name)
+        self._remove = remove
+        self.refine_edges = refine_edges
+
+    def predict_mask(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """rembg 在 image 尺寸上返回mask，再放大到 size"""
+        with stage("inference"):
+            mask = self._remove(image, only_mask=True, session=self.session)
+        if mask.size != size:
+            with stage("postprocess"):
+                mask = mask.resize(size, Image.BILINEAR)
+        return mask
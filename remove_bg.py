@@ -4,21 +4,27 @@ import importlib.util
 import subprocess
 from pathlib import Path
 
+from engine import ENGINE_BACKEND, ENGINE_BACKENDS, create_engine
+from model_registry import AVAILABLE_MODELS, QUANTIZED_MODELS
+
+# 默认后端和模型与之前直接调用 rembg 时相同
+DEFAULT_BACKEND = ENGINE_BACKEND or "rembg"
+DEFAULT_CLI_MODEL = "u2net"
+
 # 检查rembg是否已安装
 def check_rembg():
     try:
         # 检查模块是否可以导入
         if importlib.util.find_spec("rembg") is not None:
-            # 尝试导入
-            from rembg import remove
-            from PIL import Image
-            return True, remove, Image, None
+            # 尝试导入（推理通过 engine.create_engine 进行，这里只检查能否导入）
+            import rembg  # noqa: F401
+            return True, None
         else:
-            return False, None, None, "rembg模块未找到"
+            return False, "rembg模块未找到"
     except ImportError as e:
-        return False, None, None, f"导入错误: {str(e)}"
+        return False, f"导入错误: {str(e)}"
     except Exception as e:
-        return False, None, None, f"未知错误: {str(e)}"
+        return False, f"未知错误: {str(e)}"
 
 # 尝试安装rembg
 def install_rembg():
@@ -40,7 +46,7 @@ def check_environment():
     print(f"Python路径: {sys.executable}")
     
     # 检查rembg
-    rembg_available, _, _, error_msg = check_rembg()
+    rembg_available, error_msg = check_rembg()
     if rembg_available:
         print("rembg: 已安装")
         
@@ -68,18 +74,21 @@ def check_environment():
     print("\n如需更详细的诊断，请运行: python diagnose.py")
 
 # 获取rembg状态
-REMBG_AVAILABLE, remove_func, Image, error_msg = check_rembg()
+REMBG_AVAILABLE, error_msg = check_rembg()
 
-def remove_background(input_path: str, output_path: str) -> None:
+def remove_background(input_path: str, output_path: str, backend: str = DEFAULT_BACKEND,
+                      model: str = DEFAULT_CLI_MODEL) -> None:
     """
     从图片中移除背景
     
     Args:
         input_path: 输入图片的路径
         output_path: 输出图片的保存路径
+        backend: 推理后端（rembg 或 onnx）
+        model: 模型名
     """
-    # 检查rembg是否可用
-    if not REMBG_AVAILABLE:
+    # 检查rembg是否可用（onnx 后端不需要rembg）
+    if backend == "rembg" and not REMBG_AVAILABLE:
         print(f"错误: {error_msg}")
         print("rembg库未正确安装。")
         
@@ -94,11 +103,8 @@ def remove_background(input_path: str, output_path: str) -> None:
             return
     
     try:
-        # 读取输入图片
-        input_image = Image.open(input_path)
-        
-        # 移除背景
-        output_image = remove_func(input_image)
+        # 读取输入图片并移除背景（推理使用缩小解码的图片，全分辨率只用于合成）
+        output_image = create_engine(backend, model).remove_background_file(input_path)
         
         # 保存结果
         output_image.save(output_path)
@@ -124,6 +130,11 @@ def main():
     parser = argparse.ArgumentParser(description='移除图片背景的工具')
     parser.add_argument('input', type=str, nargs='?', help='输入图片的路径')
     parser.add_argument('output', type=str, nargs='?', help='输出图片的保存路径')
+    parser.add_argument('--backend', type=str, default=DEFAULT_BACKEND, choices=ENGINE_BACKENDS,
+                        help=f'推理后端：rembg，或 onnx 直接运行 models/ 下的ONNX模型（默认为{DEFAULT_BACKEND}）')
+    parser.add_argument('--model', '-m', type=str, default=DEFAULT_CLI_MODEL,
+                        choices=AVAILABLE_MODELS + QUANTIZED_MODELS,
+                        help=f'使用的模型（默认为{DEFAULT_CLI_MODEL}，量化模型只支持onnx后端）')
     parser.add_argument('--check', action='store_true', help='检查环境和依赖')
     parser.add_argument('--install', action='store_true', help='安装rembg库')
     
@@ -154,7 +165,7 @@ def main():
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # 执行背景移除
-    remove_background(args.input, args.output)
+    remove_background(args.input, args.output, args.backend, args.model)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
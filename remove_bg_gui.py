@@ -5,23 +5,29 @@ from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import threading
 import subprocess
-from pathlib import Path
 import importlib.util
 
+from engine import ENGINE_BACKEND, create_engine
+from image_io import open_full
+
+# 推理后端（环境变量 ENGINE_BACKEND，默认rembg）和模型（与rembg不传session时相同）
+BACKEND = ENGINE_BACKEND or "rembg"
+GUI_MODEL = "u2net"
+
 # 检查rembg是否已安装
 def check_rembg():
     try:
         # 检查模块是否可以导入
         if importlib.util.find_spec("rembg") is not None:
-            # 尝试导入
-            from rembg import remove
-            return True, remove, None
+            # 尝试导入（推理通过 engine.create_engine 进行，这里只检查能否导入）
+            import rembg  # noqa: F401
+            return True, None
         else:
-            return False, None, "rembg模块未找到"
+            return False, "rembg模块未找到"
     except ImportError as e:
-        return False, None, f"导入错误: {str(e)}"
+        return False, f"导入错误: {str(e)}"
     except Exception as e:
-        return False, None, f"未知错误: {str(e)}"
+        return False, f"未知错误: {str(e)}"
 
 # 尝试安装rembg
 def install_rembg():
@@ -36,7 +42,7 @@ def install_rembg():
         return False
 
 # 检查rembg状态
-REMBG_AVAILABLE, remove_func, error_msg = check_rembg()
+REMBG_AVAILABLE, error_msg = check_rembg()
 
 class BackgroundRemoverApp:
     def __init__(self, root):
@@ -50,12 +56,12 @@ class BackgroundRemoverApp:
         self.input_image = None
         self.output_image = None
         self.processing = False
-        self.remove_func = remove_func
+        self.engine = None
         
         self.create_widgets()
         
-        # 检查rembg是否已安装
-        if not REMBG_AVAILABLE:
+        # 检查rembg是否已安装（只有rembg后端需要）
+        if BACKEND == "rembg" and not REMBG_AVAILABLE:
             result = messagebox.askquestion("依赖缺失", 
                                   f"未检测到rembg库或导入失败。\n\n错误信息: {error_msg}\n\n是否尝试自动安装rembg库？")
             if result == 'yes':
@@ -125,7 +131,8 @@ class BackgroundRemoverApp:
         if file_path:
             try:
                 self.input_image_path = file_path
-                self.input_image = Image.open(file_path)
+                # 按EXIF方向转正，竖拍照片的显示和结果都保持正向
+                self.input_image = open_full(file_path)
                 self.display_image(self.input_image, self.input_canvas)
                 self.process_btn.config(state=tk.NORMAL)
                 self.status_label.config(text=f"已加载图片: {os.path.basename(file_path)}")
@@ -137,7 +144,7 @@ class BackgroundRemoverApp:
     
     def process_image(self):
         # 再次检查rembg是否可用
-        if not REMBG_AVAILABLE or self.remove_func is None:
+        if BACKEND == "rembg" and not REMBG_AVAILABLE:
             result = messagebox.askquestion("错误", "未检测到rembg库或导入失败。是否尝试安装？")
             if result == 'yes':
                 if install_rembg():
@@ -155,8 +162,12 @@ class BackgroundRemoverApp:
     
     def _process_image_thread(self):
         try:
+            # 第一次处理时才加载模型，之后复用同一个引擎
+            if self.engine is None:
+                self.engine = create_engine(BACKEND, GUI_MODEL)
+            
             # 移除背景
-            self.output_image = self.remove_func(self.input_image)
+            self.output_image = self.engine.remove_background(self.input_image)
             
             # 在主线程中更新UI
             self.root.after(0, self._update_ui_after_processing)
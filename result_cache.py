@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# 内存缓存上限（默认64MB）
+RESULT_CACHE_BYTES = int(os.getenv("RESULT_CACHE_MB", "64")) * 1024 * 1024
+# 磁盘缓存目录（不设置则不启用磁盘缓存）和上限（默认1GB）
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR")
+RESULT_CACHE_DISK_BYTES = int(os.getenv("RESULT_CACHE_DISK_MB", "1024")) * 1024 * 1024
+
+
+class ResultCache:
+    """按内容寻址的结果缓存
+
+    键为上传字节与模型、处理选项的哈希，值为编码后的结果字节。
+    内存层按LRU在字节预算内淘汰；可选的磁盘层超过上限时按最近访问时间淘汰最旧的文件。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_CACHE_BYTES,
+        disk_dir: Optional[str] = RESULT_CACHE_DIR,
+        disk_max_bytes: int = RESULT_CACHE_DISK_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(f.stat().st_size for f in self.disk_dir.glob("*.bin"))
+
+    @staticmethod
+    def key(data: bytes, **options) -> str:
+        """由输入字节和处理选项计算缓存键"""
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.bin"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """查找缓存，磁盘命中时同时放回内存层"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                value = path.read_bytes()
+                os.utime(path)  # 更新访问时间，用于淘汰
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        """写入缓存"""
+        self._put_memory(key, value)
+        if self.disk_dir is not None:
+            self._put_disk(key, value)
+
+    def _put_memory(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _put_disk(self, key: str, value: bytes) -> None:
+        if len(value) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        # 先写临时文件再原子替换，避免并发读到不完整的结果
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with self._disk_lock:
+                if path.exists():
+                    return
+                tmp_path.write_bytes(value)
+                os.replace(tmp_path, path)
+                self._disk_bytes += len(value)
+                if self._disk_bytes > self.disk_max_bytes:
+                    self._evict_disk()
+        except OSError:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _evict_disk(self) -> None:
+        """按最近访问时间从旧到新删除文件，直到低于上限的90%（避免每次写入都扫描目录）"""
+        files = []
+        for path in self.disk_dir.glob("*.bin"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "memory_max_bytes": self.max_bytes,
+                "disk_enabled": self.disk_dir is not None,
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir is not None else 0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -3,6 +3,7 @@ import base64
 from PIL import Image
 import io
 import os
+import threading
 import time
 
 class APITester:
@@ -22,9 +23,11 @@ class APITester:
         img = Image.new('RGB', (100, 100), color='red')
         img.save(os.path.join(self.test_image_path, "valid.jpg"))
         
-        # 创建一个大文件（>4MB）
-        large_img = Image.new('RGB', (2000, 2000), color='blue')
-        large_img.save(os.path.join(self.test_image_path, "too_large.jpg"), quality=100)
+        # 创建一个EXIF方向为6（顺时针旋转90°显示）的竖拍照片：像素横向存储为200x100，正向为100x200
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        rotated_img = Image.new('RGB', (200, 100), color='green')
+        rotated_img.save(os.path.join(self.test_image_path, "orientation6.jpg"), exif=exif)
 
     def test_server_status(self):
         """测试服务器状态"""
@@ -73,29 +76,47 @@ class APITester:
             print(f"❌ 测试失败: {str(e)}")
 
     def test_file_size_limit(self):
-        """测试文件大小限制"""
+        """测试文件大小限制：Content-Length 超限和分块读取超限两种情况都应返回413"""
         print("\n3. 测试文件大小限制")
         print("-" * 50)
         
-        test_image = os.path.join(self.test_image_path, "too_large.jpg")
+        with open(os.path.join(self.test_image_path, "valid.jpg"), 'rb') as f:
+            header = f.read()
         
         try:
-            with open(test_image, 'rb') as f:
-                files = {'file': ('large.jpg', f, 'image/jpeg')}
-                print("正在上传大文件...")
+            max_size = int(requests.get(f"{self.base_url}/api/status").json()["data"]["max_file_size_mb"] * 1024 * 1024)
+        except Exception as e:
+            print(f"❌ 测试失败: {str(e)}")
+            return
+        
+        cases = [
+            # 请求体远超上限，由中间件按 Content-Length 拒绝
+            ("Content-Length 超限", max_size + 1024 * 1024),
+            # 只比上限多一点，请求体仍在表单开销的余量内，由分块读取时拒绝
+            ("分块读取超限", max_size + 1024),
+        ]
+        for name, size in cases:
+            try:
+                files = {'file': ('large.jpg', header + b"\0" * (size - len(header)), 'image/jpeg')}
+                print(f"正在上传大文件（{name}）...")
+                # 模拟跨域的浏览器请求：提前拒绝的响应也应带有CORS响应头，前端才能读到413
                 response = requests.post(
                     f"{self.base_url}/api/remove-background",
-                    files=files
+                    files=files,
+                    headers={"Origin": "http://example.com"}
                 )
                 
                 print(f"状态码: {response.status_code}")
+                print(f"Access-Control-Allow-Origin: {response.headers.get('Access-Control-Allow-Origin')}")
                 result = response.json()
                 print(f"响应消息: {result['message']}")
                 
-                assert result['code'] == 400, "应该拒绝过大的文件"
-                print("✅ 文件大小限制测试通过")
-        except Exception as e:
-            print(f"❌ 测试失败: {str(e)}")
+                assert response.status_code == 413, "应该返回413状态码"
+                assert result['code'] == 413, "应该拒绝过大的文件"
+                assert response.headers.get('Access-Control-Allow-Origin'), "缺少CORS响应头"
+                print(f"✅ 文件大小限制测试通过（{name}）")
+            except Exception as e:
+                print(f"❌ 测试失败: {str(e)}")
 
     def test_invalid_format(self):
         """测试无效的文件格式"""
@@ -121,10 +142,137 @@ class APITester:
                 print(f"响应消息: {result['message']}")
                 
                 assert result['code'] == 400, "应该拒绝无效的文件格式"
+                assert "text/plain" not in result['message'], "错误信息应给出识别出的类型，而不是客户端声明的类型"
                 print("✅ 文件格式验证测试通过")
         except Exception as e:
             print(f"❌ 测试失败: {str(e)}")
 
+    def test_binary_response(self):
+        """测试二进制图片响应（Accept: image/png / image/webp）"""
+        print("\n5. 测试二进制图片响应")
+        print("-" * 50)
+        
+        test_image = os.path.join(self.test_image_path, "valid.jpg")
+        
+        for media_type in ("image/png", "image/webp"):
+            try:
+                with open(test_image, 'rb') as f:
+                    files = {'file': ('test.jpg', f, 'image/jpeg')}
+                    response = requests.post(
+                        f"{self.base_url}/api/remove-background",
+                        files=files,
+                        headers={"Accept": media_type}
+                    )
+                
+                print(f"状态码: {response.status_code}")
+                print(f"Content-Type: {response.headers.get('Content-Type')}")
+                print(f"模型: {response.headers.get('X-Model')}，缓存: {response.headers.get('X-Cache')}")
+                
+                assert response.status_code == 200, "请求失败"
+                assert response.headers.get('Content-Type') == media_type, "返回的图片类型不正确"
+                result = Image.open(io.BytesIO(response.content))
+                assert result.mode == 'RGBA', "结果应带有透明通道"
+                print(f"✅ {media_type} 二进制响应测试通过")
+            except Exception as e:
+                print(f"❌ 测试失败: {str(e)}")
+
+    def test_exif_orientation(self):
+        """测试带EXIF方向的竖拍照片：结果应按方向转正"""
+        print("\n6. 测试EXIF方向")
+        print("-" * 50)
+        
+        test_image = os.path.join(self.test_image_path, "orientation6.jpg")
+        
+        try:
+            with open(test_image, 'rb') as f:
+                files = {'file': ('portrait.jpg', f, 'image/jpeg')}
+                response = requests.post(
+                    f"{self.base_url}/api/remove-background",
+                    files=files,
+                    headers={"Accept": "image/png"}
+                )
+            
+            print(f"状态码: {response.status_code}")
+            assert response.status_code == 200, "请求失败"
+            result = Image.open(io.BytesIO(response.content))
+            print(f"结果尺寸: {result.size}")
+            assert result.size == (100, 200), "结果应为转正后的竖向尺寸"
+            print("✅ EXIF方向测试通过")
+        except Exception as e:
+            print(f"❌ 测试失败: {str(e)}")
+
+    def test_status_during_model_load(self):
+        """测试加载模型期间其他请求不被阻塞：另一个模型加载时状态接口应立即响应"""
+        print("\n7. 测试加载模型期间的状态接口")
+        print("-" * 50)
+        
+        test_image = os.path.join(self.test_image_path, "valid.jpg")
+        with open(test_image, 'rb') as f:
+            contents = f.read()
+        
+        try:
+            status = requests.get(f"{self.base_url}/api/status").json()["data"]
+            loaded = status["model_cache"]["loaded_models"]
+            unloaded = [name for name in status["available_models"] if name not in loaded]
+            if not unloaded:
+                print("所有模型都已加载，跳过")
+                return
+            
+            def remove_with_unloaded_model():
+                # 未加载的模型在处理请求的工作线程中加载
+                requests.post(
+                    f"{self.base_url}/api/remove-background",
+                    files={'file': ('test.jpg', contents, 'image/jpeg')},
+                    data={'model': unloaded[0]}
+                )
+            
+            worker = threading.Thread(target=remove_with_unloaded_model)
+            worker.start()
+            time.sleep(0.2)
+            start = time.perf_counter()
+            response = requests.get(f"{self.base_url}/api/status")
+            elapsed = time.perf_counter() - start
+            worker.join()
+            
+            print(f"状态码: {response.status_code}，耗时: {elapsed:.2f}秒")
+            assert response.status_code == 200, "服务器状态检查失败"
+            assert elapsed < 1, "状态接口被模型加载阻塞"
+            print("✅ 加载模型期间状态接口测试通过")
+        except Exception as e:
+            print(f"❌ 测试失败: {str(e)}")
+
+    def test_missing_quantized_model(self):
+        """测试请求未生成的量化模型：应和未知模型一样返回400"""
+        print("\n8. 测试未生成的量化模型")
+        print("-" * 50)
+        
+        test_image = os.path.join(self.test_image_path, "valid.jpg")
+        
+        try:
+            available = requests.get(f"{self.base_url}/api/status").json()["data"]["available_models"]
+            missing = [f"{name}_int8" for name in ("u2net", "u2netp", "u2net_human_seg")
+                       if f"{name}_int8" not in available]
+            if not missing:
+                print("所有量化模型都已生成，跳过")
+                return
+            
+            with open(test_image, 'rb') as f:
+                files = {'file': ('test.jpg', f, 'image/jpeg')}
+                response = requests.post(
+                    f"{self.base_url}/api/remove-background",
+                    files=files,
+                    data={'model': missing[0]}
+                )
+            
+            print(f"状态码: {response.status_code}")
+            result = response.json()
+            print(f"响应消息: {result['message']}")
+            
+            assert result['code'] == 400, "未生成的量化模型应返回400"
+            print("✅ 未生成的量化模型测试通过")
+        except Exception as e:
+            print(f"❌ 测试失败: {str(e)}")
+
     def run_all_tests(self):
         """运行所有测试"""
         print("开始API测试...\n")
@@ -139,6 +287,18 @@ class APITester:
         time.sleep(1)
         
         self.test_invalid_format()
+        time.sleep(1)
+        
+        self.test_binary_response()
+        time.sleep(1)
+        
+        self.test_exif_orientation()
+        time.sleep(1)
+        
+        self.test_status_during_model_load()
+        time.sleep(1)
+        
+        self.test_missing_quantized_model()
         
         print("\n测试完成!")
 
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from metrics import STAGE_SECONDS
+
+# 工作线程数和排队上限
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", str(min(4, os.cpu_count() or 1))))
+QUEUE_DEPTH = int(os.getenv("QUEUE_DEPTH", "16"))
+
+
+class QueueFullError(Exception):
+    """排队任务已达上限"""
+
+
+class WorkerPool:
+    """有界线程池，把CPU密集的解码、推理和编码移出事件循环
+
+    运行中的任务最多 max_workers 个，另外最多 max_queue 个任务排队等待；
+    超过时 run() 立即抛出 QueueFullError，由调用方快速返回503，而不是无限排队。
+    """
+
+    def __init__(self, max_workers: int = WORKER_THREADS, max_queue: int = QUEUE_DEPTH):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="worker")
+        self._lock = threading.Lock()
+
+        self.pending = 0  # 排队中和运行中的任务数
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """在线程池中执行函数，队列已满时抛出 QueueFullError"""
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"服务繁忙，排队任务已达上限（{self.max_queue}）")
+            self.pending += 1
+
+        submitted = time.perf_counter()
+
+        def task():
+            wait = time.perf_counter() - submitted
+            STAGE_SECONDS.observe(wait, stage="queue_wait")
+            with self._lock:
+                self.running += 1
+                self.started += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        def done(_):
+            # 任务结束（或未开始就被取消）后才释放名额，客户端断开不会让计数偏小
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+        future = self._executor.submit(task)
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """线程池统计，用于确定工作线程数"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": self.total_wait / self.started * 1000 if self.started else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)